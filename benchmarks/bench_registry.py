@@ -0,0 +1,124 @@
+# Benchmark for the data layer on synthetic registries, headless (no Streamlit).
+#
+# For each storage backend and registry size it times, in a fresh temporary
+# directory: a bulk save of the registry, load_data() from disk and from the
+# cache, get_patient_data() lookups, single save_data() calls (with their
+# change log) and the derived fields, and reports throughput and peak traced
+# memory. --json writes the results for comparison between releases.
+#
+#   python benchmarks/bench_registry.py --sizes 1000 10000 100000 --backends sqlite parquet
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import synthetic_records  # noqa: E402
+from registry import audit, metrics, store  # noqa: E402
+from registry.derived import derive  # noqa: E402
+from registry.schema import KEY  # noqa: E402
+
+EXTENSIONS = {"sqlite": ".db", "parquet": ".parquet", "excel": ".xlsx"}
+
+
+# Run fn once; returns (seconds, peak MiB or None, result)
+def _measure(fn, trace):
+    if trace:
+        tracemalloc.start()
+    began = time.perf_counter()
+    try:
+        result = fn()
+        elapsed = time.perf_counter() - began
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20 if trace else None
+    finally:
+        if trace:
+            tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def _wait_for_compaction():
+    for thread in threading.enumerate():
+        if thread.name == "registry-compaction":
+            thread.join()
+
+
+def bench(backend, visits, lookups, saves, trace, seed=0):
+    records = synthetic_records(visits, seed=seed)
+    mrns = sorted({record[KEY] for record in records})
+    rng = np.random.default_rng(seed)
+    results = []
+
+    def record(operation, count, unit, measured):
+        seconds, peak, _ = measured
+        results.append({
+            "backend": backend, "visits": visits, "operation": operation, "seconds": round(seconds, 4),
+            "throughput": round(count / seconds, 1) if seconds else None, "unit": unit,
+            "peak_mib": round(peak, 1) if peak is not None else None,
+        })
+
+    with tempfile.TemporaryDirectory() as directory:
+        store.storage_backend, store.storage_path = backend, os.path.join(directory, "registry" + EXTENSIONS[backend])
+        audit.path = os.path.join(directory, "registry.audit.db")
+
+        record("bulk save", visits, "visits/s", _measure(lambda: store.save_records(records, audited=False), trace))
+        _wait_for_compaction()
+        results[-1]["file_bytes"] = metrics.file_size(store.storage_path)
+
+        def cold_load():
+            store.invalidate_cache()
+            return store.load_data()
+
+        record("load_data (disk)", visits, "visits/s", _measure(cold_load, trace))
+        record("load_data (cached)", 1, "calls/s", _measure(store.load_data, trace))
+
+        frame = store.load_data()
+        record("derived fields", visits, "visits/s", _measure(lambda: derive(frame), trace))
+
+        sample = rng.choice(mrns, lookups)
+        record("get_patient_data", lookups, "lookups/s", _measure(lambda: [store.get_patient_data(mrn) for mrn in sample], trace))
+
+        def single_saves():
+            for mrn in rng.choice(mrns, saves):
+                new_visit = dict(records[0], MRN=mrn, Follow_up_date="2030-01-01")
+                store.save_data(new_visit)
+
+        record("save_data", saves, "saves/s", _measure(single_saves, trace))
+        _wait_for_compaction()
+        store.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Data layer benchmark on synthetic registries")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="visits per registry")
+    parser.add_argument("--backends", nargs="+", default=["sqlite"], choices=sorted(EXTENSIONS))
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--saves", type=int, default=50)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (its overhead inflates timings)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'backend':<8} {'visits':>7}  {'operation':<20} {'seconds':>9} {'throughput':>16} {'peak MiB':>9}")
+    for backend in args.backends:
+        for visits in args.sizes:
+            for row in bench(backend, visits, args.lookups, args.saves, not args.no_memory):
+                results.append(row)
+                peak = f"{row['peak_mib']:9.1f}" if row["peak_mib"] is not None else f"{'-':>9}"
+                throughput = f"{row['throughput']:,.0f} {row['unit']}"
+                print(f"{backend:<8} {visits:>7}  {row['operation']:<20} {row['seconds']:9.3f} {throughput:>16} {peak}")
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
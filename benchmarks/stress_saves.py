@@ -0,0 +1,112 @@
+# Stress test for concurrent saves.
+#
+# Runs several processes, each with several threads, all calling save_data()
+# against one fresh registry in a temporary directory, then checks that every
+# saved visit is present exactly once. For comparison it times the original
+# save path (read the workbook, append one row, rewrite it) run serially.
+#
+#   python benchmarks/stress_saves.py --backend excel --processes 4 --threads 4 --saves 25
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry import audit, store  # noqa: E402
+from registry.schema import COLUMNS  # noqa: E402
+
+EXTENSIONS = {"sqlite": ".db", "parquet": ".parquet", "excel": ".xlsx"}
+
+
+def _record(mrn):
+    record = {column: "Absent" for column in COLUMNS}
+    record.update({
+        "MRN": mrn, "Date_of_Birth": "1950-01-01", "Age": 74,
+        "Date_of_Last_Radiotherapy": "2023-01-01", "Follow_up_date": "2024-01-01", "Follow_up_time": 12,
+        "Histology": ["Acinar Adenocarcinoma"], "ISUP": "2", "Dose": ["36.25Gy"], "Volume": ["Whole Prostate"],
+    })
+    return record
+
+
+def _saver(backend, path, worker, threads, saves, start):
+    store.storage_backend, store.storage_path = backend, path
+    # Log the changes next to the temporary registry, not in the real change log
+    audit.path = os.path.join(os.path.dirname(path), "registry.audit.db")
+
+    def run(thread):
+        for i in range(saves):
+            store.save_data(_record(f"p{worker}-t{thread}-{i}"))
+
+    start.wait()
+    pool = [threading.Thread(target=run, args=(thread,)) for thread in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+
+# The save path before the journal: read everything, append one row, rewrite everything
+def _legacy_save(path, data):
+    df = pd.read_excel(path) if os.path.exists(path) else pd.DataFrame(columns=COLUMNS)
+    df = pd.concat([df, pd.DataFrame([{key: str(value) if isinstance(value, list) else value for key, value in data.items()}])], ignore_index=True)
+    df.to_excel(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent save stress test")
+    parser.add_argument("--backend", choices=sorted(EXTENSIONS), default="sqlite")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--saves", type=int, default=25, help="saves per thread")
+    parser.add_argument("--baseline-saves", type=int, default=100, help="saves timed with the legacy full rewrite")
+    args = parser.parse_args()
+
+    total = args.processes * args.threads * args.saves
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "registry" + EXTENSIONS[args.backend])
+        start = multiprocessing.Event()
+        workers = [
+            multiprocessing.Process(target=_saver, args=(args.backend, path, worker, args.threads, args.saves, start))
+            for worker in range(args.processes)
+        ]
+        for worker in workers:
+            worker.start()
+        began = time.perf_counter()
+        start.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - began
+        failed = [worker.exitcode for worker in workers if worker.exitcode]
+
+        store.storage_backend, store.storage_path = args.backend, path
+        mrns = store.load_data()["MRN"]
+        expected = {f"p{p}-t{t}-{i}" for p in range(args.processes) for t in range(args.threads) for i in range(args.saves)}
+        lost = expected - set(mrns)
+        duplicated = int(mrns.duplicated().sum())
+
+        legacy_path = os.path.join(tmp, "legacy.xlsx")
+        began = time.perf_counter()
+        for i in range(args.baseline_saves):
+            _legacy_save(legacy_path, _record(f"legacy-{i}"))
+        legacy_elapsed = time.perf_counter() - began
+
+    print(f"backend:            {args.backend}")
+    print(f"concurrent saves:   {total} ({args.processes} processes x {args.threads} threads)")
+    print(f"  rows stored:      {len(mrns)}  lost: {len(lost)}  duplicated: {duplicated}")
+    print(f"  throughput:       {total / elapsed:.1f} saves/s")
+    print(f"legacy full rewrite: {args.baseline_saves} serial saves")
+    print(f"  throughput:       {args.baseline_saves / legacy_elapsed:.1f} saves/s")
+
+    if failed or lost or duplicated:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# Synthetic registries for benchmarks: the columns load_data() returns and
+# the values the form offers, with a realistic shape (several visits per
+# patient every 3-6 months after radiotherapy, mostly low CTCAE grades, a
+# minority of patients with recurrence or death).
+#
+#   python benchmarks/synthetic.py --visits 10000 --out synthetic.csv
+#
+# The CSV can be loaded with python -m registry.bulk_import.
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry.derived import derive  # noqa: E402
+from registry.encoding import GRADE_RANK  # noqa: E402
+from registry.form import DERIVED_COLUMNS, FIELDS  # noqa: E402
+from registry.options import MULTI_CHOICE, SINGLE_CHOICE, TOXICITY_FIELDS  # noqa: E402
+from registry.schema import COLUMNS, KEY, PATIENT_COLUMNS  # noqa: E402
+
+# The columns saved by the form, in registry order
+SYNTHETIC_COLUMNS = [column for column in COLUMNS if column in FIELDS or column in DERIVED_COLUMNS]
+
+# Share of patients who have each event at some point
+EVENT_RATES = {"biochemical_recurrence": 0.15, "local_recurrence": 0.05, "regional_recurrence": 0.04, "distant_recurrence": 0.06, "death": 0.05}
+
+
+def _iso(days):
+    return pd.to_datetime(days, unit="D").strftime("%Y-%m-%d").to_numpy(dtype=object)
+
+
+def _grades(rng, column, size):
+    options = SINGLE_CHOICE[column]
+    weights = np.array([0.25 ** GRADE_RANK[option] for option in options])
+    return rng.choice(options, size, p=weights / weights.sum())
+
+
+def _multiselect(rng, column, size):
+    options = MULTI_CHOICE[column]
+    first = rng.integers(0, len(options), size)
+    second = rng.integers(0, len(options), size)
+    both = rng.random(size) < 0.2
+    return np.array([
+        str([options[a]] if not pair or a == b else [options[min(a, b)], options[max(a, b)]])
+        for a, b, pair in zip(first, second, both)
+    ], dtype=object)
+
+
+# A registry of `visits` follow-up visits as a frame of form records
+def synthetic_registry(visits, visits_per_patient=4, seed=0):
+    rng = np.random.default_rng(seed)
+    patients = max(1, visits // visits_per_patient)
+    patient = rng.integers(0, patients, visits)
+    patient.sort()
+    frame = pd.DataFrame({KEY: np.char.add("SYN", patient.astype(str)).astype(object)})
+
+    # Static details: one draw per patient, repeated on each of their visits
+    epoch = np.datetime64("1970-01-01")
+    radiotherapy = (np.datetime64("2015-01-01") - epoch).astype(int) + rng.integers(0, 8 * 365, patients)
+    birth = radiotherapy - rng.integers(50 * 365, 85 * 365, patients)
+    static = {
+        "Date_of_Birth": _iso(birth),
+        "Date_of_Last_Radiotherapy": _iso(radiotherapy),
+        "Biopsy_date": _iso(radiotherapy - rng.integers(60, 365, patients)),
+        "iPSA": rng.lognormal(2.2, 0.8, patients).round().clip(0, 10000).astype(int),
+    }
+    for column in ("ADT", "ARATs", "Chemotherapy", "Radioligant_Therapy"):
+        start = radiotherapy - rng.integers(0, 180, patients)
+        static[f"{column}_first_date"] = _iso(start)
+        static[f"{column}_last_date"] = _iso(start + rng.integers(90, 3 * 365, patients))
+    for column in PATIENT_COLUMNS:
+        if column in SINGLE_CHOICE:
+            static[column] = rng.choice(SINGLE_CHOICE[column], patients)
+        elif column in MULTI_CHOICE:
+            static[column] = _multiselect(rng, column, patients)
+    for column, values in static.items():
+        frame[column] = np.asarray(values)[patient]
+
+    # Visits every 3-6 months after radiotherapy
+    visit_number = frame.groupby(KEY).cumcount().to_numpy()
+    follow_up = radiotherapy[patient] + (visit_number + 1) * rng.integers(90, 180, visits)
+    frame["Follow_up_date"] = _iso(follow_up)
+    frame["IPSS"] = rng.integers(0, 36, visits)
+    for column in TOXICITY_FIELDS:
+        frame[column] = _grades(rng, column, visits)
+    frame["Overal_tolerance"] = rng.choice(SINGLE_CHOICE["Overal_tolerance"], visits, p=[0.4, 0.35, 0.2, 0.05])
+
+    # Events: from the visit an event is first recorded on, it stays recorded
+    for event, rate in EVENT_RATES.items():
+        has_event = rng.random(patients) < rate
+        event_day = radiotherapy + rng.integers(90, 6 * 365, patients)
+        recorded = has_event[patient] & (follow_up >= event_day[patient])
+        frame[event] = np.where(recorded, "Yes", "No")
+        frame[f"{event}_date"] = np.where(recorded, _iso(event_day)[patient], None)
+    frame["Cancer_related_death"] = np.where(frame["death"] == "Yes", rng.choice(["Yes", "No"], visits, p=[0.7, 0.3]), None)
+
+    return derive(frame.reindex(columns=SYNTHETIC_COLUMNS))
+
+
+# The registry as records for store.save_records()
+def synthetic_records(visits, visits_per_patient=4, seed=0):
+    frame = synthetic_registry(visits, visits_per_patient, seed)
+    return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic registry as CSV")
+    parser.add_argument("--visits", type=int, default=10000)
+    parser.add_argument("--visits-per-patient", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="synthetic.csv")
+    args = parser.parse_args()
+    frame = synthetic_registry(args.visits, args.visits_per_patient, args.seed)
+    frame.to_csv(args.out, index=False)
+    print(f"Wrote {len(frame)} visits for {frame[KEY].nunique()} patients to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
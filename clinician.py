@@ -0,0 +1,19 @@
+import streamlit as st
+
+
+# The signed-in account where the app is deployed with authentication; locally
+# Streamlit reports a placeholder address, which says nothing about who saved
+def signed_in_user():
+    email = st.experimental_user.get("email")
+    return None if email in (None, "test@example.com") else email
+
+
+# Who is entering data in this session, asked for in the sidebar and recorded
+# in the change log with each save or repair. It is kept under its own key
+# rather than the widget's, which Streamlit drops on pages that don't draw it.
+def current():
+    if "clinician" not in st.session_state:
+        st.session_state["clinician"] = signed_in_user() or ""
+    name = st.sidebar.text_input("Your name (recorded in the change log)", value=st.session_state["clinician"], key="clinician_name")
+    st.session_state["clinician"] = name.strip()
+    return st.session_state["clinician"]
@@ -0,0 +1,39 @@
+import streamlit as st
+
+from registry.aggregates import BREAKDOWN_FIELDS, get_aggregates
+from registry.options import TOXICITY_FIELDS
+
+st.title("Cohort Analytics - Prostate Prospective Registry")
+
+# Aggregates are kept up to date as visits are saved, so this doesn't scan the registry
+aggregates = get_aggregates()
+
+patients_col, visits_col = st.columns(2)
+patients_col.metric("Patients", aggregates.patient_count)
+visits_col.metric("Follow-up visits", aggregates.visit_count)
+
+# Toxicity
+st.subheader("Toxicity by CTCAE Grade")
+st.caption("Number of follow-up visits at each grade")
+st.dataframe(aggregates.grade_table(), use_container_width=True)
+
+st.subheader("Toxicity by Treatment")
+by_col, field_col = st.columns(2)
+by = by_col.radio("Break down by", BREAKDOWN_FIELDS, horizontal=True)
+field = field_col.selectbox("Side effect", TOXICITY_FIELDS, index=TOXICITY_FIELDS.index("Proctitis"))
+breakdown = aggregates.breakdown_table(by, field)
+if breakdown.empty:
+    st.info(f"No {field} grades recorded with a {by} yet.")
+else:
+    st.dataframe(breakdown, use_container_width=True)
+
+# Recurrence
+st.subheader("Recurrence")
+st.dataframe(aggregates.recurrence_table(), use_container_width=True)
+
+# Tumour characteristics
+st.subheader("ISUP Distribution")
+st.bar_chart(aggregates.distribution("ISUP"))
+
+st.subheader("Clinical Stage Distribution")
+st.bar_chart(aggregates.distribution("Clinical Stage"))
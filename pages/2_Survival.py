@@ -0,0 +1,49 @@
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+from registry.survival import ENDPOINTS, STRATA, registry_curves, registry_undated_events
+
+st.title("Survival Analysis - Prostate Prospective Registry")
+st.caption("Kaplan-Meier estimates from the last radiotherapy. Patients without the event are censored at their latest follow-up.")
+
+endpoint_col, strata_col = st.columns(2)
+endpoint = endpoint_col.selectbox("Endpoint", list(ENDPOINTS))
+by = strata_col.radio("Stratify by", list(STRATA), horizontal=True)
+show_ci = st.checkbox("Show 95% confidence intervals", value=by == "None")
+
+curves = registry_curves(endpoint, by)
+undated = registry_undated_events(endpoint)
+if len(undated):
+    st.warning(f"{len(undated)} patients are left out: their {endpoint.lower()} is recorded without a date. MRNs: {', '.join(map(str, undated[:20]))}{' ...' if len(undated) > 20 else ''}")
+if not curves:
+    st.info("No patients with follow-up recorded yet.")
+    st.stop()
+
+plot = pd.concat([curve.assign(stratum=stratum) for stratum, curve in curves.items()], ignore_index=True)
+base = alt.Chart(plot).encode(
+    x=alt.X("time:Q", title="Months since last radiotherapy"),
+    color=alt.Color("stratum:N", title=by if by != "None" else None),
+)
+chart = base.mark_line(interpolate="step-after").encode(
+    y=alt.Y("survival:Q", title=f"{endpoint}-free probability", scale=alt.Scale(domain=[0, 1])),
+    tooltip=["stratum", "time", "at_risk", "events", alt.Tooltip("survival:Q", format=".3f")],
+)
+if show_ci:
+    chart = base.mark_area(interpolate="step-after", opacity=0.15).encode(y="lower:Q", y2="upper:Q") + chart
+st.altair_chart(chart, use_container_width=True)
+
+# Summary per stratum
+summary = pd.DataFrame.from_dict({
+    stratum: {
+        "Patients": int(curve["at_risk"].iloc[0]),
+        "Events": int(curve["events"].sum()),
+        "Censored": int(curve["censored"].sum()),
+        **{
+            f"{months} months": round(float(curve.loc[curve["time"] <= months, "survival"].iloc[-1]), 3)
+            for months in (12, 24, 60)
+        },
+    }
+    for stratum, curve in curves.items()
+}, orient="index")
+st.dataframe(summary, use_container_width=True)
@@ -0,0 +1,50 @@
+import os
+from datetime import date
+
+import streamlit as st
+
+from registry import export
+from registry.options import ISUP, MULTI_CHOICE
+
+st.title("Export - Prostate Prospective Registry")
+st.caption("Exports are point-in-time snapshots built in the background: data entry carries on while they are prepared.")
+
+with st.form("export_form"):
+    fmt = st.radio("Format", list(export.FORMATS), format_func=export.FORMATS.get, horizontal=True)
+    by_date = st.checkbox("Only follow-ups in a date range")
+    since_col, until_col = st.columns(2)
+    since = since_col.date_input("From", value=date(2000, 1, 1), min_value=date(1900, 1, 1))
+    until = until_col.date_input("To", value=date.today(), min_value=date(1900, 1, 1))
+    isup = st.multiselect("ISUP", ISUP)
+    dose = st.multiselect("Dose", MULTI_CHOICE["Dose"])
+    mrns = st.text_area("MRNs (one per line, empty for all patients)")
+    submitted = st.form_submit_button("Start export")
+
+if submitted:
+    filters = {"where": {}}
+    if by_date:
+        filters.update(since=since, until=until)
+    if isup:
+        filters["where"]["ISUP"] = isup
+    if dose:
+        filters["where"]["Dose"] = dose
+    if mrns.strip():
+        filters["mrns"] = [line for line in mrns.splitlines() if line.strip()]
+    path = export.new_path(fmt)
+    st.session_state.exports = [(path, export.submit(path, **filters))] + st.session_state.get("exports", [])
+
+# This session's exports, newest first
+exports = st.session_state.get("exports", [])
+if exports:
+    st.subheader("Your exports")
+for path, future in exports:
+    name = os.path.basename(path)
+    if not future.done():
+        st.write(f"{name}: in progress")
+    elif future.exception() is not None:
+        st.error(f"{name}: failed ({future.exception()})")
+    elif os.path.exists(path):
+        with open(path, "rb") as handle:
+            st.download_button(f"Download {name} ({future.result()} rows)", handle, file_name=name, key=path)
+if any(not future.done() for _, future in exports):
+    st.button("Refresh")
@@ -0,0 +1,57 @@
+import math
+from datetime import date
+
+import streamlit as st
+
+from registry.index import VISIT_DATE
+from registry.options import ISUP, TOXICITY_FIELDS
+from registry.schema import COLUMNS, KEY
+from registry.search import PAGE_SIZE, registry_index
+
+GRADES = ["I", "II", "III", "IV", "V"]
+ANY_SIDE_EFFECT = "Any side effect"
+
+st.title("Registry Browser - Prostate Prospective Registry")
+
+# Filters run on the server against the shared registry index; only the current page is sent
+with st.sidebar:
+    st.header("Filters")
+    mrn = st.text_input("MRN starts with")
+    by_date = st.checkbox("Follow-up date range")
+    since = st.date_input("From", value=date(2000, 1, 1), min_value=date(1900, 1, 1), disabled=not by_date)
+    until = st.date_input("To", value=date.today(), min_value=date(1900, 1, 1), disabled=not by_date)
+    isup = st.multiselect("ISUP", ISUP)
+    recurrence = st.radio("Biochemical recurrence", ["Any", "Yes", "No"], horizontal=True)
+    side_effect = st.selectbox("Side effect", [ANY_SIDE_EFFECT] + TOXICITY_FIELDS)
+    min_grade = st.selectbox("Minimum CTCAE grade", ["Any"] + GRADES)
+
+    st.header("Sort")
+    sort_by = st.selectbox("Sort by", [VISIT_DATE, KEY] + [column for column in COLUMNS if column not in (VISIT_DATE, KEY)])
+    descending = st.toggle("Descending", value=True)
+
+filters = {"where": {}, "mrn": mrn or None}
+if by_date:
+    filters.update(since=since, until=until)
+if isup:
+    filters["where"]["ISUP"] = isup
+if recurrence != "Any":
+    filters["where"]["biochemical_recurrence"] = [recurrence]
+if min_grade != "Any":
+    if side_effect == ANY_SIDE_EFFECT:
+        filters["any_grade"] = min_grade
+    else:
+        filters["grades"] = {side_effect: min_grade}
+
+index = registry_index()
+matches = index.matches(sort_by=sort_by, descending=descending, **filters)
+pages = max(1, math.ceil(len(matches) / PAGE_SIZE))
+# Start from the first page whenever the filters or sort change
+signature = repr((filters, sort_by, descending))
+if st.session_state.get("browser_filters") != signature:
+    st.session_state.browser_filters = signature
+    st.session_state.browser_page = 1
+st.session_state.browser_page = min(st.session_state.browser_page, pages)
+page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key="browser_page")
+
+st.caption(f"{len(matches):,} of {len(index):,} visits match")
+st.dataframe(index.page(matches, page - 1), use_container_width=True, hide_index=True)
@@ -0,0 +1,75 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from clinician import current as current_clinician
+from registry import audit, metrics, quality, store, warmup
+from registry.form import FIELDS
+
+st.title("Admin - Prostate Prospective Registry")
+
+# The panel is opt-in: it shows timings for every session in this process
+if os.environ.get("REGISTRY_ADMIN") != "1":
+    st.info("The admin panel is disabled. Start the app with REGISTRY_ADMIN=1 to enable it.")
+    st.stop()
+
+# Repairs are logged under this name, as saves are
+user = current_clinician()
+
+st.caption(f"Storage: {store.storage_backend} at {store.storage_path} ({metrics.file_size(store.storage_path) or 0:,} bytes)")
+
+st.subheader("Startup")
+st.caption("Background warm-up of the registry and its indexes in this process (REGISTRY_WARMUP=0 turns it off).")
+st.dataframe(pd.DataFrame(warmup.status()), use_container_width=True, hide_index=True)
+
+st.subheader("Timings")
+st.caption(f"Over the last {metrics.HISTORY:,} spans in this process. rows and bytes are from the latest span.")
+st.dataframe(metrics.summary(), use_container_width=True)
+
+recent = metrics.spans()
+name = st.selectbox("Span", ["All"] + sorted({record["span"] for record in recent}))
+if name != "All":
+    recent = [record for record in recent if record["span"] == name]
+if recent:
+    frame = pd.DataFrame(recent[-500:])
+    st.line_chart(frame, x="time", y="ms")
+    st.dataframe(frame.iloc[::-1], use_container_width=True, hide_index=True)
+
+download_col, clear_col = st.columns(2)
+download_col.download_button(
+    "Download spans (JSON lines)",
+    metrics.spans_jsonl(),
+    file_name="registry-metrics.jsonl",
+    mime="application/x-ndjson",
+)
+if clear_col.button("Clear"):
+    metrics.clear()
+    st.rerun()
+
+st.subheader("Change log")
+st.caption(f"Field-level changes per save, from {audit.path}.")
+mrn_col, field_col = st.columns(2)
+mrn = mrn_col.text_input("MRN").strip() or None
+field = field_col.selectbox("Field", ["All"] + sorted(FIELDS))
+changes = audit.history(mrn, None if field == "All" else field)
+st.dataframe(changes.iloc[::-1].head(1000), use_container_width=True, hide_index=True)
+
+st.subheader("Data quality")
+st.caption("Checks the stored registry for legacy keys, values outside the form's options, impossible dates and duplicate visits.")
+check_col, repair_col = st.columns(2)
+if check_col.button("Check"):
+    st.session_state.quality = quality.check()
+if repair_col.button("Repair", help="Fix what needs no review (legacy keys, spellings, dates with a time, \"N/A\" markers, exact duplicates), then check again"):
+    if not user:
+        st.error("Please enter your name in the sidebar before repairing: the changes are logged under it.")
+    else:
+        quality.repair(user=user)
+        st.session_state.quality = quality.check()
+if "quality" in st.session_state:
+    issues = st.session_state.quality
+    if issues.empty:
+        st.success("No issues found")
+    else:
+        st.dataframe(quality.summary(issues), use_container_width=True, hide_index=True)
+        st.download_button("Download issues (CSV)", issues.to_csv(index=False), file_name="registry-quality.csv", mime="text/csv")
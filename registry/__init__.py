@@ -0,0 +1,4 @@
+# Data layer for the Prostate Prospective Registry app.
+#
+# Everything in this package runs without Streamlit so it can be shared by
+# the app, its pages and headless scripts.
@@ -0,0 +1,176 @@
+# Cohort aggregates for the analytics page: toxicity grade distributions,
+# toxicity by dose and by volume, recurrence counts and ISUP / clinical stage
+# distributions.
+#
+# The counts are kept in memory and brought up to date with only the rows
+# saved since the last refresh (both tables are append-only), so the page
+# never rescans the registry. When a patient's details change, only that
+# patient's contributions are moved.
+
+import threading
+from collections import Counter
+
+import pandas as pd
+
+from registry import store
+from registry.encoding import parse_items
+from registry.options import MULTI_CHOICE, RECURRENCE_FIELDS, SINGLE_CHOICE, TOXICITY_FIELDS
+from registry.schema import KEY, canonical_frame
+
+# Static fields toxicity is broken down by
+BREAKDOWN_FIELDS = ["Dose", "Volume"]
+# Static fields whose distribution across patients is shown
+DISTRIBUTION_FIELDS = ["ISUP", "Clinical Stage"]
+
+class CohortAggregates:
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.grades = Counter()          # (field, grade) -> visits
+        self.breakdown = {field: Counter() for field in BREAKDOWN_FIELDS}  # (item, field, grade) -> visits
+        self.recurrence_visits = Counter()  # field -> visits with "Yes"
+        self.recurrence_patients = {field: set() for field in RECURRENCE_FIELDS}
+        self.distributions = {field: Counter() for field in DISTRIBUTION_FIELDS}  # value -> patients
+        self.visit_count = 0
+        self._patients = {}              # MRN -> {field: tuple of values} for the current details
+        self._recorded = set()           # MRNs with a row in the patients table
+        self._visit_positions = {}       # MRN -> positions of counted visits
+        self._visits_size = 0
+        self._patients_size = 0
+        self._visits = None
+        self._source = None
+
+    # Count rows appended to either table since the last refresh. `source`
+    # identifies where the frames came from; when it changes (e.g. a table was
+    # rewritten) everything is counted again.
+    def refresh(self, visits, patients, source=None):
+        if len(visits) < self._visits_size or len(patients) < self._patients_size or source != self._source:
+            self._reset()
+            self._source = source
+        self._visits = visits
+        new_patients = canonical_frame(patients.iloc[self._patients_size:])
+        new_visits = canonical_frame(visits.iloc[self._visits_size:])
+        self._patients_size, self._visits_size = len(patients), len(visits)
+
+        # Details first, so new visits are counted under their patient's current
+        # dose/volume. Rows saved before the registry was split carry the
+        # details themselves; they count until the patient has a patient record.
+        legacy = [field for field in BREAKDOWN_FIELDS + DISTRIBUTION_FIELDS if field in new_visits]
+        if legacy:
+            rows = new_visits[[KEY] + legacy].dropna(subset=legacy, how="all").drop_duplicates(KEY, keep="last")
+            rows = rows[~rows[KEY].isin(self._recorded)]
+            if not rows.empty:
+                self._update_patients(rows)
+        if not new_patients.empty:
+            self._recorded.update(new_patients[KEY])
+            self._update_patients(new_patients.drop_duplicates(KEY, keep="last"))
+        if not new_visits.empty:
+            self._add_visits(new_visits, 1)
+            for mrn, positions in new_visits.groupby(KEY).indices.items():
+                self._visit_positions.setdefault(mrn, []).extend(new_visits.index[positions])
+
+    # Details are per patient, so plain Python is fine here
+    def _patient_values(self, rows):
+        values = {}
+        for mrn, row in zip(rows[KEY], rows.to_dict("records")):
+            details = {}
+            for field in BREAKDOWN_FIELDS + DISTRIBUTION_FIELDS:
+                value = row.get(field)
+                if field in MULTI_CHOICE:
+                    details[field] = tuple(parse_items(value))
+                else:
+                    details[field] = () if pd.isna(value) else (str(value),)
+            values[mrn] = details
+        return values
+
+    def _update_patients(self, rows):
+        for mrn, details in self._patient_values(rows).items():
+            previous = self._patients.get(mrn)
+            self._patients[mrn] = details
+            for field in DISTRIBUTION_FIELDS:
+                if previous:
+                    self.distributions[field].subtract(previous[field])
+                self.distributions[field].update(details[field])
+            # Move this patient's already counted visits to their new dose/volume
+            if previous and mrn in self._visit_positions and any(previous[field] != details[field] for field in BREAKDOWN_FIELDS):
+                counted = canonical_frame(self._visits.loc[self._visit_positions[mrn]])
+                self._add_breakdown(counted, -1, {mrn: previous})
+                self._add_breakdown(counted, 1)
+        for field in DISTRIBUTION_FIELDS:
+            self.distributions[field] = +self.distributions[field]
+
+    def _add_breakdown(self, visits, sign, patients=None):
+        patients = patients or self._patients
+        fields = [field for field in TOXICITY_FIELDS if field in visits]
+        for by in BREAKDOWN_FIELDS:
+            # One entry per (visit, dose) or (visit, volume) of the visit's patient
+            items = visits[KEY].map(lambda mrn: patients.get(mrn, {}).get(by, ())).explode().dropna()
+            if items.empty:
+                continue
+            for field in fields:
+                grades = visits.loc[items.index, field]
+                counts = pd.DataFrame({"item": items.to_numpy(), "grade": grades.to_numpy()}).groupby(["item", "grade"]).size()
+                self.breakdown[by].update({(item, field, grade): sign * count for (item, grade), count in counts.items()})
+            self.breakdown[by] = +self.breakdown[by]
+
+    def _add_visits(self, visits, sign):
+        self.visit_count += sign * len(visits)
+        for field in TOXICITY_FIELDS:
+            if field in visits:
+                self.grades.update({(field, grade): sign * count for grade, count in visits[field].value_counts().items()})
+        self.grades = +self.grades
+        self._add_breakdown(visits, sign)
+        for field in RECURRENCE_FIELDS:
+            if field in visits:
+                positive = visits.loc[visits[field] == "Yes", KEY]
+                self.recurrence_visits[field] += sign * len(positive)
+                self.recurrence_patients[field].update(positive)
+
+    # Grade distribution table: one row per toxicity field, one column per grade
+    def grade_table(self):
+        grades = ["None", "Absent", "Present", "I", "II", "III", "IV", "V"]
+        table = pd.DataFrame(0, index=TOXICITY_FIELDS, columns=grades)
+        for (field, grade), count in self.grades.items():
+            if field in table.index:
+                table.loc[field, grade] = count
+        return table.loc[:, (table != 0).any()]
+
+    # Grade counts for one toxicity field, broken down by Dose or Volume
+    def breakdown_table(self, by, field):
+        rows = {(item, grade): count for (item, f, grade), count in self.breakdown[by].items() if f == field}
+        table = pd.Series(rows, dtype=int).unstack(fill_value=0) if rows else pd.DataFrame()
+        if table.empty:
+            return table
+        order = [grade for grade in SINGLE_CHOICE[field] if grade in table.columns]
+        return table[order + [grade for grade in table.columns if grade not in order]]
+
+    def recurrence_table(self):
+        patients = len(self._patients) or 1
+        return pd.DataFrame({
+            "Visits": [self.recurrence_visits[field] for field in RECURRENCE_FIELDS],
+            "Patients": [len(self.recurrence_patients[field]) for field in RECURRENCE_FIELDS],
+            "% of patients": [round(100 * len(self.recurrence_patients[field]) / patients, 1) for field in RECURRENCE_FIELDS],
+        }, index=RECURRENCE_FIELDS)
+
+    def distribution(self, field):
+        counts = pd.Series(self.distributions[field], dtype=int)
+        options = SINGLE_CHOICE.get(field) or MULTI_CHOICE.get(field)
+        return counts.reindex([value for value in options if value in counts.index] + [value for value in counts.index if value not in options])
+
+    @property
+    def patient_count(self):
+        return len(self._patients)
+
+
+_lock = threading.Lock()
+_aggregates = CohortAggregates()
+
+
+# The process-wide aggregates, brought up to date with any rows saved since the last call
+def get_aggregates():
+    backends = [store.get_backend("visits"), store.get_backend("patients")]
+    visits, patients = (backend.load() for backend in backends)
+    with _lock:
+        _aggregates.refresh(visits, patients, [(id(backend), backend.generation) for backend in backends])
+        return _aggregates
@@ -0,0 +1,111 @@
+# Change log of registry saves: one row per field that a save changed (who,
+# when, MRN, field, old -> new), rather than the full rows the registry
+# itself appends.
+#
+# The log is a small SQLite file: each save is one row in `saves` (time and
+# user), and its changes point at it, indexed by MRN and by field. Every
+# change has an increasing seq, so a downstream consumer can sync
+# incrementally with changes_since(last_seq) instead of re-reading the registry.
+
+import getpass
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from registry.form import DERIVED_COLUMNS
+from registry.schema import KEY
+
+# Change log file, kept apart from the registry itself
+path = "registry.audit.db"
+
+COLUMNS = ["seq", "time", "user", "mrn", "field", "old", "new"]
+
+_lock = threading.Lock()
+_conn = {"path": None, "conn": None}
+
+
+def _connect():
+    if _conn["path"] != path:
+        conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS saves (id INTEGER PRIMARY KEY, time TEXT NOT NULL, user TEXT)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, save INTEGER NOT NULL, "
+                "mrn TEXT NOT NULL, field TEXT NOT NULL, old TEXT, new TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS changes_mrn ON changes (mrn, seq)")
+            conn.execute("CREATE INDEX IF NOT EXISTS changes_field ON changes (field, seq)")
+        _conn.update(path=path, conn=conn)
+    return _conn["conn"]
+
+
+# Who saved, when the caller doesn't say: REGISTRY_USER or the OS account
+def default_user():
+    return os.environ.get("REGISTRY_USER") or getpass.getuser()
+
+
+def _text(value):
+    if value is None or (not isinstance(value, (list, tuple)) and pd.isna(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# Field-level changes from `before` (a dict, or None for nothing stored yet)
+# to `after`, as (field, old, new). Derived fields are left out: they follow
+# from the dates, whose changes are logged.
+def diff(before, after, differs):
+    changes = []
+    for field, value in after.items():
+        if field == KEY or field in DERIVED_COLUMNS:
+            continue
+        old = None if before is None else before.get(field)
+        if old is not value and old != value and differs(old, value):
+            changes.append((field, _text(old), _text(value)))
+    return changes
+
+
+# Append the changes from one save: (mrn, field, old, new) tuples
+def record(changes, user=None, when=None):
+    if not changes:
+        return
+    when = (when or datetime.now(timezone.utc)).isoformat(timespec="seconds")
+    user = user or default_user()
+    with _lock:
+        conn = _connect()
+        with conn:
+            save = conn.execute("INSERT INTO saves (time, user) VALUES (?, ?)", (when, user)).lastrowid
+            conn.executemany(
+                "INSERT INTO changes (save, mrn, field, old, new) VALUES (?, ?, ?, ?, ?)",
+                [(save, mrn, field, old, new) for mrn, field, old, new in changes],
+            )
+
+
+def _query(where, params, limit=None):
+    sql = f"SELECT {', '.join(COLUMNS)} FROM changes JOIN saves ON saves.id = changes.save {where} ORDER BY seq"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    with _lock:
+        return pd.read_sql_query(sql, _connect(), params=params)
+
+
+# Changes to one patient and/or one field, oldest first
+def history(mrn=None, field=None, limit=None):
+    clauses, params = [], []
+    if mrn is not None:
+        clauses.append("mrn = ?")
+        params.append(str(mrn).strip())
+    if field is not None:
+        clauses.append("field = ?")
+        params.append(field)
+    return _query("WHERE " + " AND ".join(clauses) if clauses else "", params, limit)
+
+
+# Changes after `seq`, for incremental consumers; pass the last seq seen
+def changes_since(seq=0, limit=None):
+    return _query("WHERE seq > ?", [int(seq)], limit)
@@ -0,0 +1,484 @@
+import json
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from registry import metrics
+from registry.index import VISIT_DATE, MrnIndex
+from registry.locking import FileLock
+from registry.schema import KEY, empty_frame, normalise_mrn
+
+# Storage backends for the registry. A backend holds one table (visits or
+# patients, see registry/schema.py) and provides:
+#   load()        -> the whole registry as a DataFrame (cached, read-only)
+#   lookup(mrn)   -> the rows for one MRN, oldest follow-up first
+#   append(rows)  -> durably add rows (dicts of cell values)
+#   invalidate()  -> forget cached state so the next call re-reads storage
+#   close()
+
+
+# Journaled backends keep a snapshot file plus an append-only journal next to
+# it (one JSON line per row), so an append costs the same whatever the size of
+# the registry. Once COMPACT_EVERY rows have accumulated, a background thread
+# folds the journal into a new snapshot and swaps it in with os.replace, so
+# the snapshot on disk is never truncated.
+#
+# Each snapshot records the last journal entry folded into it (its watermark).
+# Entries at or below it are skipped when the journal is replayed, which makes
+# a crash at any point during compaction harmless. A compacted journal starts
+# with a marker entry holding the watermark (no row), so an append finds the
+# next sequence number from the journal alone, without reading the snapshot.
+#
+# The parsed snapshot is keyed on the file's (mtime, size), so a snapshot
+# written by another process is picked up on the next load; the journal is
+# read incrementally. Appends only read the journal's new lines; the rows
+# saved since the last load are added to the cached frame and its MRN index
+# in one batch on the next load, rather than rebuilding either.
+#
+# Several processes may share the files: appends and the compaction swap hold
+# an exclusive lock on <path>.lock, and only one process compacts at a time.
+class JournaledBackend:
+    COMPACT_EVERY = 200
+
+    def __init__(self, path, table, columns):
+        self.path = path
+        self.table = table
+        self.columns = columns
+        self.journal_path = path + ".journal"
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(path + ".lock")
+        self._compaction_lock = FileLock(path + ".compact.lock")
+        # Counts the times the cached frame was rebuilt rather than appended to
+        self.generation = 0
+        self.invalidate()
+
+    # Subclasses read a snapshot as (frame, watermark) and write one to `tmp`
+    def _read_snapshot(self):
+        raise NotImplementedError
+
+    def _write_snapshot(self, df, watermark, tmp):
+        raise NotImplementedError
+
+    def _tmp_snapshot_path(self):
+        root, ext = os.path.splitext(self.path)
+        return root + ".compacting" + ext
+
+    def invalidate(self):
+        with self._lock:
+            self._signature = None
+            self._snapshot = None
+            self._watermark = 0
+            self._frame = None
+            self._index = None
+            self._applied = 0
+            self._journal = self._new_journal_state()
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _new_journal_state(inode=None):
+        return {"inode": inode, "offset": 0, "size": 0, "entries": [], "last_seq": 0, "base": 0}
+
+    # Read journal lines appended since the last call (by us or another process)
+    def _refresh_journal(self):
+        journal = self._journal
+        try:
+            stat = os.stat(self.journal_path)
+        except OSError:
+            self._journal = self._new_journal_state()
+            return
+        if stat.st_ino != journal["inode"] or stat.st_size < journal["size"]:
+            journal = self._journal = self._new_journal_state(stat.st_ino)
+        if stat.st_size == journal["size"]:
+            return
+
+        with open(self.journal_path, "rb") as f:
+            f.seek(journal["offset"])
+            chunk = f.read(stat.st_size - journal["offset"])
+
+        # Only complete lines count; a trailing fragment is a save still being written
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A save torn by a crash; everything after it is intact
+                continue
+            journal["entries"].append(entry)
+            journal["last_seq"] = max(journal["last_seq"], entry["seq"])
+            if "row" not in entry:
+                journal["base"] = max(journal["base"], entry["seq"])
+        journal["offset"] += end
+        journal["size"] = journal["offset"] + len(chunk) - end
+
+    def load(self):
+        with self._lock:
+            while True:
+                signature = _file_signature(self.path)
+                if self._snapshot is None or self._signature != signature:
+                    with metrics.span("read_snapshot", table=self.table, bytes=signature and signature[1]) as fields:
+                        self._snapshot, self._watermark = self._read_snapshot() if signature else (empty_frame(self.columns), 0)
+                        fields["rows"] = len(self._snapshot)
+                    self._snapshot[KEY] = normalise_mrn(self._snapshot[KEY])
+                    self._signature = signature
+                    self._frame = None
+
+                inode = self._journal["inode"]
+                self._refresh_journal()
+                # Another process compacted: start again from the snapshot
+                if self._journal["inode"] != inode:
+                    self._frame = None
+                # ...and if it swapped the snapshot while we read the journal,
+                # the journal we read may already be truncated: read both again
+                if _file_signature(self.path) == self._signature:
+                    break
+
+            if self._frame is None:
+                self._frame, self._index, self._applied = self._snapshot, MrnIndex(), 0
+                self.generation += 1
+            entries = self._journal["entries"][self._applied:]
+            rows = [entry["row"] for entry in entries if entry["seq"] > self._watermark and "row" in entry]
+            if rows:
+                self._frame = _concat(self._frame, pd.DataFrame(rows))
+            self._applied += len(entries)
+            self._index.extend(self._frame)
+            return self._frame
+
+    def lookup(self, mrn):
+        with self._lock:
+            df = self.load()
+            return df.iloc[self._index.positions(mrn)]
+
+    # Rows are appended to the journal and fsynced before returning; the
+    # snapshot is only rewritten by the background compaction. Only the
+    # journal's new lines are read, so an append costs the same at any size.
+    def append(self, rows):
+        with metrics.span("append", table=self.table, rows=len(rows)) as fields, self._lock, self._file_lock:
+            # Pick up other processes' entries so sequence numbers stay unique.
+            # If one compacted meanwhile, the new journal's marker carries its watermark.
+            self._refresh_journal()
+            seq = max(self._journal["last_seq"], self._watermark)
+            lines = []
+            for row in rows:
+                seq += 1
+                lines.append(json.dumps({"seq": seq, "row": row}, default=str))
+            data = "\n".join(lines) + "\n"
+            # Start on a fresh line if a previous save was torn by a crash
+            if self._journal["size"] > self._journal["offset"]:
+                data = "\n" + data
+            with open(self.journal_path, "ab") as f:
+                f.write(data.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            pending = seq - max(self._watermark, self._journal["base"])
+            fields["bytes"] = metrics.file_size(self.journal_path)
+
+        if pending >= self.COMPACT_EVERY:
+            threading.Thread(target=self.compact, name="registry-compaction", daemon=True).start()
+
+    # Fold the journal into a new snapshot, then drop the folded entries from
+    # the journal. Appends keep going to the journal while the snapshot is
+    # written; only the capture and the final swap hold the locks.
+    def compact(self):
+        with self._lock:
+            if not self._compaction_lock.acquire(blocking=False):
+                return
+        try:
+            with self._lock, self._file_lock:
+                frame = self.load()
+                watermark = max(self._journal["last_seq"], self._watermark)
+                if watermark == self._watermark:
+                    return
+                offset, inode = self._journal["offset"], self._journal["inode"]
+                applied = self._applied
+
+            tmp = self._tmp_snapshot_path()
+            with metrics.span("compact", table=self.table, rows=len(frame)) as fields:
+                self._write_snapshot(frame, watermark, tmp)
+                _fsync_file(tmp)
+                fields["bytes"] = metrics.file_size(tmp)
+
+            with self._lock, self._file_lock:
+                os.replace(tmp, self.path)
+                self._signature = _file_signature(self.path)
+                self._snapshot, self._watermark = frame, watermark
+                if self._truncate_journal(offset, inode, watermark):
+                    # The cached frame and index stay valid: entries saved
+                    # during the compaction are still applied, and they now
+                    # follow the marker at the start of the new journal
+                    self._applied -= applied - 1
+                else:
+                    self._frame = None
+        finally:
+            with self._lock:
+                self._compaction_lock.release()
+
+    # Rewrite the whole table as fix(current rows), e.g. to repair stored data;
+    # fix returns the new frame, or None to leave the table as it is. The new
+    # snapshot folds in the whole journal, which is then emptied. Appends and
+    # compaction wait throughout, so no save is lost. Returns True if rewritten.
+    def rewrite(self, fix):
+        # Its own lock object: a background compaction may hold the shared one
+        with FileLock(self.path + ".compact.lock"), self._lock, self._file_lock:
+            frame = fix(self.load())
+            if frame is None:
+                return False
+            watermark = max(self._journal["last_seq"], self._watermark)
+            tmp = self._tmp_snapshot_path()
+            with metrics.span("rewrite", table=self.table, rows=len(frame)) as fields:
+                self._write_snapshot(frame, watermark, tmp)
+                _fsync_file(tmp)
+                fields["bytes"] = metrics.file_size(tmp)
+            os.replace(tmp, self.path)
+            if os.path.exists(self.journal_path):
+                self._truncate_journal(os.path.getsize(self.journal_path), os.stat(self.journal_path).st_ino, watermark)
+            self.invalidate()
+            return True
+
+    # Rewrite the journal without its first `offset` bytes (already in the
+    # snapshot), starting with a marker for the snapshot's watermark
+    def _truncate_journal(self, offset, inode, watermark):
+        if os.stat(self.journal_path).st_ino != inode:
+            return False
+        with open(self.journal_path, "rb") as f:
+            f.seek(offset)
+            tail = f.read()
+        tmp = self.journal_path + ".compacting"
+        with open(tmp, "wb") as f:
+            f.write(json.dumps({"seq": watermark}).encode("utf-8") + b"\n")
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.journal_path)
+        self._journal = self._new_journal_state(os.stat(self.journal_path).st_ino)
+        return True
+
+
+# The registry kept in an .xlsx workbook. The watermark is stored as a custom
+# document property, so the workbook still opens normally in Excel.
+# openpyxl (and pyarrow below) are only imported once a backend needs them,
+# which keeps them out of the app's startup with the default SQLite backend.
+class ExcelBackend(JournaledBackend):
+    WATERMARK_PROPERTY = "journal_seq"
+
+    def _read_snapshot(self):
+        from openpyxl import load_workbook
+        book = load_workbook(self.path, read_only=True)
+        watermark = 0
+        for prop in book.custom_doc_props:
+            if prop.name == self.WATERMARK_PROPERTY:
+                watermark = int(prop.value)
+        # Only empty cells are missing: "None" is a CTCAE grade and "NA" could be an MRN.
+        # Cells keep the type they were written with: parsing text that looks
+        # like a number would turn MRN "00123" into 123 after a compaction.
+        return pd.read_excel(book, engine="openpyxl", dtype=object, keep_default_na=False, na_values=[""]), watermark
+
+    def _write_snapshot(self, df, watermark, tmp):
+        from openpyxl.packaging.custom import IntProperty
+        with pd.ExcelWriter(tmp, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False)
+            writer.book.custom_doc_props.append(IntProperty(name=self.WATERMARK_PROPERTY, value=watermark))
+
+
+# The registry kept in a Parquet file, with the watermark in the file metadata
+class ParquetBackend(JournaledBackend):
+    WATERMARK_KEY = b"journal_seq"
+
+    def _read_snapshot(self):
+        import pyarrow.parquet as pq
+        table = pq.read_table(self.path)
+        watermark = int((table.schema.metadata or {}).get(self.WATERMARK_KEY, 0))
+        return table.to_pandas(), watermark
+
+    def _write_snapshot(self, df, watermark, tmp):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(_uniform_object_columns(df), preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[self.WATERMARK_KEY] = str(watermark).encode()
+        pq.write_table(table.replace_schema_metadata(metadata), tmp)
+
+
+# The registry kept in an SQLite table with an index on MRN. Lookups and
+# appends only touch the rows involved, so the MRN index here is SQLite's own.
+# load() fetches rows added since the previous call, and PRAGMA data_version
+# tells us when another process wrote.
+class SqliteBackend:
+    def __init__(self, path, table, columns):
+        self.path = path
+        self.table = table
+        self._lock = threading.RLock()
+        # SQLite does its own locking between processes; wait for other writers
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(_quote(column) for column in columns)})")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_mrn ON {table} ({_quote(KEY)})")
+        self.generation = 0
+        self.invalidate()
+
+    def _table_columns(self):
+        return [row[1] for row in self._conn.execute(f"PRAGMA table_info({self.table})")]
+
+    def invalidate(self):
+        with self._lock:
+            self._columns = self._table_columns()
+            self._frame = None
+            self._last_rowid = 0
+            self._data_version = None
+            self._schema_version = None
+            self._dirty = True
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _select(self, where="", params=()):
+        query = f"SELECT rowid AS _rowid, * FROM {self.table} {where} ORDER BY rowid"
+        return pd.read_sql_query(query, self._conn, params=params)
+
+    def load(self):
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            # A rewrite (here or in another process) recreates the table: read it all again
+            schema_version = self._conn.execute("PRAGMA schema_version").fetchone()[0]
+            if schema_version != self._schema_version:
+                self._frame, self._last_rowid, self._schema_version = None, 0, schema_version
+            if self._frame is None or self._dirty or data_version != self._data_version:
+                self._columns = self._table_columns()
+                with metrics.span("read_rows", table=self.table, bytes=metrics.file_size(self.path)) as fields:
+                    new_rows = self._select("WHERE rowid > ?", (self._last_rowid,))
+                    fields["rows"] = len(new_rows)
+                if not new_rows.empty:
+                    self._last_rowid = int(new_rows["_rowid"].iloc[-1])
+                new_rows = new_rows.drop(columns="_rowid")
+                new_rows[KEY] = normalise_mrn(new_rows[KEY])
+                if self._frame is None:
+                    self._frame = new_rows
+                    self.generation += 1
+                elif not new_rows.empty:
+                    self._frame = _concat(self._frame, new_rows)
+                self._data_version = data_version
+                self._dirty = False
+            return self._frame
+
+    def lookup(self, mrn):
+        with self._lock:
+            rows = self._select(f"WHERE {_quote(KEY)} = ?", (mrn,))
+        # Same order as MrnIndex: undated visits first, then by date, then by save order
+        rows["_date"] = pd.to_datetime(rows[VISIT_DATE], errors="coerce") if VISIT_DATE in rows else pd.NaT
+        rows = rows.sort_values(["_date", "_rowid"], na_position="first", kind="stable")
+        return rows.drop(columns=["_rowid", "_date"]).reset_index(drop=True)
+
+    def append(self, rows):
+        with metrics.span("append", table=self.table, rows=len(rows)) as fields, self._lock:
+            # Rows may carry keys the table doesn't have yet; keep them rather than drop data
+            for column in dict.fromkeys(key for row in rows for key in row):
+                if column not in self._columns:
+                    self._conn.execute(f"ALTER TABLE {self.table} ADD COLUMN {_quote(column)}")
+                    self._columns.append(column)
+            placeholders = ", ".join("?" for _ in self._columns)
+            columns = ", ".join(_quote(column) for column in self._columns)
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO {self.table} ({columns}) VALUES ({placeholders})",
+                    [[_sql_value(row.get(column)) for column in self._columns] for row in rows],
+                )
+            self._dirty = True
+            fields["bytes"] = metrics.file_size(self.path)
+
+    # Rewrite the whole table as fix(current rows), in one transaction that
+    # other writers wait for; fix returns the new frame, or None to leave the
+    # table as it is. Returns True if rewritten.
+    def rewrite(self, fix):
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            # Other writers now wait, so the cached rows plus any new ones are the whole table
+            frame = fix(self.load())
+            if frame is None:
+                return False
+            with metrics.span("rewrite", table=self.table, rows=len(frame)) as fields:
+                columns = ", ".join(_quote(column) for column in frame.columns)
+                self._conn.execute(f"DROP TABLE {self.table}")
+                self._conn.execute(f"CREATE TABLE {self.table} ({columns})")
+                self._conn.execute(f"CREATE INDEX {self.table}_mrn ON {self.table} ({_quote(KEY)})")
+                self._conn.executemany(
+                    f"INSERT INTO {self.table} ({columns}) VALUES ({', '.join('?' for _ in frame.columns)})",
+                    [[_sql_value(value) for value in row] for row in frame.astype(object).where(frame.notna(), None).itertuples(index=False)],
+                )
+                fields["bytes"] = metrics.file_size(self.path)
+        self.invalidate()
+        return True
+
+
+BACKENDS = {
+    "excel": ExcelBackend,
+    "parquet": ParquetBackend,
+    "sqlite": SqliteBackend,
+}
+
+
+def open_backend(kind, path, table, columns):
+    try:
+        backend_class = BACKENDS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend {kind!r}; expected one of {sorted(BACKENDS)}") from None
+    return backend_class(path, table, columns)
+
+
+# Signature used to detect changes to a file, None if it is missing
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# Append new rows to a frame. Empty frames and all-missing columns are left
+# out of the concat: they say nothing about the column types, and pandas
+# warns that it will start taking them into account. Only columns whose
+# types differ are checked, so appending a few rows doesn't scan the frame.
+def _concat(frame, new):
+    columns = list(frame.columns) + [column for column in new.columns if column not in frame.columns]
+    if frame.empty:
+        return new.reindex(columns=columns)
+    differ = [column for column in new.columns if column in frame.columns and new[column].dtype != frame[column].dtype]
+    if differ:
+        new = new.drop(columns=[column for column in differ if new[column].isna().all()])
+        frame = frame.drop(columns=[column for column in differ if column in new.columns and frame[column].isna().all()])
+    combined = pd.concat([frame, new], ignore_index=True)
+    return combined if list(combined.columns) == columns else combined.reindex(columns=columns)
+
+
+def _fsync_file(path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+# sqlite3 only binds plain Python values
+def _sql_value(value):
+    if value is None or isinstance(value, (str, int, float, bytes)):
+        return value
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+# Parquet needs one type per column; columns mixing strings and numbers
+# (e.g. "N/A" next to a number of months) are stored as strings
+def _uniform_object_columns(df):
+    df = df.infer_objects()
+    for column in df.columns[df.dtypes == object]:
+        is_str = df[column].dropna().map(type).eq(str)
+        if is_str.any() and not is_str.all():
+            df[column] = df[column].map(lambda value: value if pd.isna(value) or isinstance(value, str) else str(value))
+    return df
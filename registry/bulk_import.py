@@ -0,0 +1,176 @@
+# Bulk import of historical registry data from CSV or XLSX.
+#
+# The file is read in chunks so memory stays bounded whatever its size. Each
+# chunk is validated column by column against the options the form offers,
+# dates are normalised to YYYY-MM-DD, and the valid rows are saved in one
+# batch. Rejected rows are written to a CSV error report (one line per
+# problem) rather than kept in memory.
+#
+#   python -m registry.bulk_import legacy.xlsx --errors legacy.errors.csv
+
+import argparse
+import csv
+import os
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from registry import store
+from registry.encoding import parse_items
+from registry.options import DATE_COLUMNS, MULTI_CHOICE, NUMERIC_RANGES, SINGLE_CHOICE
+from registry.schema import COLUMNS, KEY, LEGACY_KEYS, canonical_frame
+
+CHUNKSIZE = 5000
+
+# Values meaning "not recorded" in legacy spreadsheets
+MISSING = ["", "nan", "NaN", "None", "N/A", "NA"]
+
+
+# Read a CSV or XLSX file as chunks of string columns
+def read_chunks(path, chunksize=CHUNKSIZE):
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+        yield from _read_excel_chunks(path, chunksize)
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False)
+
+
+# pandas can't stream a workbook; openpyxl's read-only mode can
+def _read_excel_chunks(path, chunksize):
+    book = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = book.worksheets[0].iter_rows(values_only=True)
+        header = [str(name) for name in next(rows, ())]
+        chunk = []
+        for row in rows:
+            chunk.append(["" if value is None else _cell_text(value) for value in row])
+            if len(chunk) == chunksize:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        book.close()
+
+
+def _cell_text(value):
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
+
+
+# Parse dates, trying the stored format first and anything else only for the rest
+def _parse_dates(values):
+    dates = pd.to_datetime(values, format="%Y-%m-%d", errors="coerce")
+    retry = dates.isna() & values.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(values[retry], format="mixed", errors="coerce")
+    return dates
+
+
+# Validate and normalise one chunk. Returns the cleaned chunk and a frame of
+# errors (row, column, value, message); rows with errors should be dropped.
+def validate_chunk(chunk):
+    # Legacy column names (e.g. "Death") are folded into their schema column
+    # before anything outside the schema is dropped; blanks don't count
+    chunk = canonical_frame(chunk.where(chunk != ""))
+    chunk = chunk[[column for column in chunk.columns if column in COLUMNS]].copy()
+    for column in chunk.columns:
+        values = chunk[column].str.strip()
+        # ...except where the value is one of the options, e.g. the "None" grade
+        missing = [value for value in MISSING if value not in SINGLE_CHOICE.get(column, ())]
+        chunk[column] = values.where(~values.isin(missing))
+    errors = []
+
+    def reject(mask, column, message):
+        if mask.any():
+            errors.append(pd.DataFrame({
+                "row": chunk.index[mask], "column": column, "value": chunk.loc[mask, column], "message": message,
+            }))
+
+    if KEY not in chunk:
+        reject(pd.Series(True, index=chunk.index), KEY, "missing MRN column")
+    else:
+        reject(chunk[KEY].isna(), KEY, "MRN is required")
+
+    for column in chunk.columns.intersection(list(SINGLE_CHOICE)):
+        values = chunk[column]
+        reject(values.notna() & ~values.isin(SINGLE_CHOICE[column]), column, "not one of the form's options")
+
+    for column in chunk.columns.intersection(list(MULTI_CHOICE)):
+        # Each distinct value is parsed once
+        parsed = {value: parse_items(value) for value in chunk[column].dropna().unique()}
+        items = chunk[column].map(parsed).explode()
+        items = items[items.notna()]
+        bad = items[~items.isin(MULTI_CHOICE[column])].index.unique()
+        reject(chunk.index.isin(bad), column, "contains a value that is not one of the form's options")
+        # Store the same string form the form does
+        grouped = items.groupby(level=0).agg(list)
+        chunk[column] = grouped.map(str).reindex(chunk.index)
+
+    for column in chunk.columns.intersection(DATE_COLUMNS):
+        dates = _parse_dates(chunk[column])
+        reject(chunk[column].notna() & dates.isna(), column, "not a date")
+        chunk[column] = dates.dt.strftime("%Y-%m-%d").where(dates.notna(), None)
+
+    for column in chunk.columns.intersection(list(NUMERIC_RANGES)):
+        numbers = pd.to_numeric(chunk[column], errors="coerce")
+        low, high = NUMERIC_RANGES[column]
+        invalid = chunk[column].notna() & numbers.isna()
+        if low is not None:
+            invalid |= numbers < low
+        if high is not None:
+            invalid |= numbers > high
+        reject(invalid, column, "not a number in range")
+        chunk[column] = numbers.astype(object).where(numbers.notna(), None)
+
+    errors = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=["row", "column", "value", "message"])
+    return chunk, errors
+
+
+# Import a file into the registry. Row numbers in the error report are data
+# rows counted from 1 (the header is not counted).
+def import_file(path, errors_path=None, chunksize=CHUNKSIZE):
+    errors_path = errors_path or os.path.splitext(path)[0] + ".errors.csv"
+    summary = {"rows": 0, "imported": 0, "rejected": 0, "ignored_columns": []}
+
+    with open(errors_path, "w", newline="") as report:
+        writer = csv.writer(report)
+        writer.writerow(["row", "column", "value", "message"])
+        offset = 0
+        for chunk in read_chunks(path, chunksize):
+            if offset == 0:
+                # Legacy headers (e.g. "Death") are imported under their schema column
+                summary["ignored_columns"] = [column for column in chunk.columns if column not in COLUMNS and column not in LEGACY_KEYS]
+            chunk.index = range(offset + 1, offset + len(chunk) + 1)
+            offset += len(chunk)
+
+            clean, errors = validate_chunk(chunk)
+            writer.writerows(errors.itertuples(index=False, name=None))
+            valid = clean.drop(index=errors["row"].unique())
+            # Historical rows are not changes: keep them out of the audit log
+            store.save_records(valid.astype(object).where(valid.notna(), None).to_dict("records"), audited=False)
+
+            summary["rows"] += len(chunk)
+            summary["imported"] += len(valid)
+            summary["rejected"] += len(chunk) - len(valid)
+
+    summary["errors_path"] = errors_path
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import historical registry data from CSV or XLSX")
+    parser.add_argument("path")
+    parser.add_argument("--errors", help="where to write the error report (default: <path>.errors.csv)")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+
+    summary = import_file(args.path, args.errors, args.chunksize)
+    print(f"{summary['imported']} of {summary['rows']} rows imported, {summary['rejected']} rejected")
+    if summary["ignored_columns"]:
+        print(f"Ignored columns not in the registry: {', '.join(summary['ignored_columns'])}")
+    print(f"Error report: {summary['errors_path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# Reference text shown next to graded fields: the ISUP grade groups and the
+# CTCAE v5 grade definitions for each side effect, keyed by registry column.
+
+GRADE_DESCRIPTIONS = {
+    "ISUP": [
+        "ISUP 1 = Gleason 3+3",
+        "ISUP 2 = Gleason 3+4",
+        "ISUP 3 = Gleason 4+3",
+        "ISUP 4 = Gleason 4+4, 3+5, 5+3",
+        "ISUP 5 = Gleason 4+5, 5+4, 5+5",
+    ],
+    "Fatigue": [
+        "Grade 0: No fatigue",
+        "Grade I: Mild fatigue; no change in activity",
+        "Grade II: Moderate fatigue; limiting instrumental ADL",
+        "Grade III: Severe fatigue; limiting self care ADL",
+    ],
+    "Cystitis": [
+        "Grade 0: No change",
+        "Grade I: Microscopic hematuria; minimal increase in frequency, urgency, dysuria, or nocturia; new onset of incontinence",
+        "Grade II: Moderate hematuria; moderate increase in frequency, urgency, dysuria, nocturia or incontinence; urinary catheter placement or bladder irrigation indicated; limiting instrumental ADL",
+        "Grade III: Gross hematuria; transfusion, IV medications, or hospitalization indicated; elective invasive intervention indicated",
+        "Grade IV: Life-threatening consequences; urgent invasive intervention indicated",
+        "Grade V: Death",
+    ],
+    "Bladder_Perforation": [
+        "Absent: No change",
+        "Grade II: Invasive intervention not indicated",
+        "Grade III: Symptomatic; medical intervention indicated",
+        "Grade IV: Life-threatening consequences; urgent intervention indicated",
+        "Grade V: Death",
+    ],
+    "Bladder_Spasms": [
+        "Absent: No change",
+        "Grade I: Intervention not indicated",
+        "Grade II: Antispasmodics indicated",
+        "Grade III: Hospitalization indicated",
+    ],
+    "Hematuria": [
+        "Absent: No change",
+        "Grade I: Asymptomatic; clinical or diagnostic observations only; intervention not indicated",
+        "Grade II: Symptomatic; urinary catheter or bladder irrigation indicated; limiting instrumental ADL",
+        "Grade III: Gross hematuria; transfusion, IV medications, or hospitalization indicated; elective invasive intervention indicated; limiting self care ADL",
+        "Grade IV: Life-threatening consequences; urgent invasive intervention indicated",
+        "Grade V: Death",
+    ],
+    "Urinary_Fistula": [
+        "Absent: No change",
+        "Grade II: Invasive intervention not indicated",
+        "Grade III: Symptomatic; medical intervention indicated",
+        "Grade IV: Life-threatening consequences; urgent intervention indicated",
+        "Grade V: Death",
+    ],
+    "Urinary_Frequency": [
+        "Absent: No change",
+        "Grade I: Mild increase in frequency; intervention not indicated",
+        "Grade II: Moderate increase in frequency; limiting instrumental ADL",
+    ],
+    "Urinary_Incontinence": [
+        "Absent: No change",
+        "Grade I: Occasional, pads not indicated",
+        "Grade II: Spontaneous; pads indicated; limiting instrumental ADL",
+        "Grade III: Intervention indicated (e.g., clamp, collagen injections); operative intervention indicated; limiting self care ADL",
+    ],
+    "Urinary_Retention": [
+        "Absent: No change",
+        "Grade I: Urinary, suprapubic or intermittent catheter placement not indicated; able to void with some residual",
+        "Grade II: Placement of urinary, suprapubic or intermittent catheter placement indicated; medication indicated",
+        "Grade III: Elective invasive intervention indicated; substantial loss of affected kidney function or mass",
+        "Grade IV: Life-threatening consequences; organ failure; urgent operative intervention indicated",
+        "Grade V: Death",
+    ],
+    "Urinary_Obstruction": [
+        "Absent: No change",
+        "Grade I: Asymptomatic; clinical or diagnostic observations only; intervention not indicated",
+        "Grade II: Symptomatic but no hydronephrosis, sepsis, or renal dysfunction; urethral dilation, urinary or suprapubic catheter indicated",
+        "Grade III: Altered organ function (e.g., hydronephrosis or renal dysfunction); invasive intervention indicated",
+        "Grade IV: Life-threatening consequences; urgent intervention indicated",
+        "Grade V: Death",
+    ],
+    "Urinary_Urgency": [
+        "Absent: No change",
+        "Grade I: Mild increase in frequency; intervention not indicated",
+        "Grade II: Moderate increase in frequency; limiting instrumental ADL",
+    ],
+    "Diarrhea": [
+        "Absent: No change",
+        "Grade I: Increase of <4 stools/day over baseline; mild increase in ostomy output compared to baseline",
+        "Grade II: Increase of 4-6 stools/day over baseline; moderate increase in ostomy output compared to baseline; limiting instrumental ADL",
+        "Grade III: Increase of ≥7 stools/day over baseline; incontinence; limiting self care ADL",
+        "Grade IV: Life-threatening consequences; urgent intervention indicated",
+        "Grade V: Death",
+    ],
+    "Nausea": [
+        "Absent: No change",
+        "Grade I: Loss of appetite without alteration in eating habits",
+        "Grade II: Oral intake decreased without significant weight loss, dehydration, or malnutrition; IV fluids indicated <24 hrs",
+        "Grade III: Inadequate oral caloric or fluid intake; tube feeding or TPN indicated",
+        "Grade IV: Life-threatening consequences; urgent intervention indicated",
+        "Grade V: Death",
+    ],
+    "Proctitis": [
+        "Absent: No change",
+        "Grade I: Asymptomatic; clinical or diagnostic observations only; intervention not indicated",
+        "Grade II: Symptomatic (e.g., rectal discomfort, passing blood or mucus); medical intervention indicated; limiting instrumental ADL",
+        "Grade III: Severe symptoms; fecal urgency or stool incontinence; limiting self care ADL",
+        "Grade IV: Life-threatening consequences; urgent intervention indicated",
+        "Grade V: Death",
+    ],
+    "Rectal_Fistula": [
+        "Absent: No change",
+        "Grade I: Asymptomatic; clinical or diagnostic observations only; intervention not indicated",
+        "Grade II: Symptomatic, Invasive intervention not indicated",
+        "Grade III: Symptomatic; medical intervention indicated",
+        "Grade IV: Life-threatening consequences; urgent intervention indicated",
+        "Grade V: Death",
+    ],
+    "Rectal_Hemorrhage": [
+        "Absent: No change",
+        "Grade I: Minimal bleeding identified on imaging; intervention not indicated",
+        "Grade II: Moderate bleeding; medical intervention indicated",
+        "Grade III: Transfusion, radiologic, endoscopic or elective operative intervention indicated",
+        "Grade IV: Life-threatening consequences; urgent intervention indicated",
+        "Grade V: Death",
+    ],
+    "Rectal_Pain": [
+        "Absent: No change",
+        "Grade I: Mild discomfort; analgesics not indicated",
+        "Grade II: Moderate pain; analgesics indicated; limiting instrumental ADL",
+        "Grade III: Severe pain; limiting self care ADL",
+    ],
+    "Rectal_perforation": [
+        "Absent: No change",
+        "Grade II: Invasive intervention not indicated",
+        "Grade III: Symptomatic; medical intervention indicated",
+        "Grade IV: Life-threatening consequences; urgent intervention indicated",
+        "Grade V: Death",
+    ],
+    "Rectal_Stenosis": [
+        "Absent: No change",
+        "Grade I: Asymptomatic; clinical or diagnostic observations only; intervention not indicated",
+        "Grade II: Symptomatic; medical intervention indicated",
+        "Grade III: Severe symptoms; limiting self care ADL",
+        "Grade IV: Life-threatening consequences; urgent intervention indicated",
+        "Grade V: Death",
+    ],
+    "Erectile_Dysfunction": [
+        "Absent: No change",
+        "Grade I: Decrease in erectile function (frequency or rigidity of erections) but intervention not indicated (e.g., medication or use of mechanical device, penile pump)",
+        "Grade II: Decrease in erectile function (frequency/rigidity of erections), erectile intervention indicated, (e.g., medication or mechanical devices such as penile pump)",
+        "Grade III: Decrease in erectile function (frequency/rigidity of erections) but erectile intervention not helpful (e.g., medication or mechanical devices such as penile pump); placement of a permanent penile prosthesis indicated (not previously present)",
+    ],
+    "Gynecomastia": [
+        "Absent: No change",
+        "Grade I: Mild; asymptomatic or mild symptoms; clinical or diagnostic observations only; intervention not indicated",
+        "Grade II: Moderate; minimal, local or noninvasive intervention indicated; limiting instrumental ADL",
+        "Grade III: Severe symptoms; elective operative intervention indicated",
+    ],
+    "Ejaculation_Disorder": [
+        "Absent: No change",
+        "Grade I: Diminished ejaculation",
+        "Grade II: Anejaculation or retrograde ejaculation",
+    ],
+    "Testosterone_deficiency": [
+        "Absent: No change",
+        "Grade I: Asymptomatic; clinical or diagnostic observations only; intervention not indicated",
+        "Grade II: Symptomatic; medical intervention indicated",
+    ],
+}
@@ -0,0 +1,77 @@
+# Fields derived from the stored dates: age, follow-up time and the time to
+# each event. They are recomputed for the whole frame in one vectorised pass
+# whenever the registry is loaded, so they always match the dates.
+
+import numpy as np
+import pandas as pd
+
+# time_to_* column -> the event date it is measured to (only stored when the event occurred)
+EVENTS = {
+    "time_to_biochemical_recurrence": "biochemical_recurrence_date",
+    "time_to_local_recurrence": "local_recurrence_date",
+    "time_to_regional_recurrence": "regional_recurrence_date",
+    "time_to_distant_recurrence": "distant_recurrence_date",
+    "time_to_death": "death_date",
+}
+
+
+# Helper function to calculate time in months
+def calculate_months(start_date, end_date):
+    return (end_date.year - start_date.year) * 12 + (end_date.month - start_date.month)
+
+
+# Age in whole years on a given date
+def calculate_age(date_of_birth, on):
+    return on.year - date_of_birth.year - ((on.month, on.day) < (date_of_birth.month, date_of_birth.day))
+
+
+# Whole months since 1970-01 for each date (year * 12 + month, shifted), NaN if missing
+def _month_index(dates):
+    months = dates.to_numpy(dtype="datetime64[ns]").astype("datetime64[M]").astype(float)
+    months[dates.isna().to_numpy()] = np.nan
+    return months
+
+
+# Nullable integers from floats, without astype("Int64")'s per-value checks
+def _integers(values, index):
+    missing = np.isnan(values)
+    return pd.Series(pd.arrays.IntegerArray(np.where(missing, 0, values).astype(np.int64), missing), index=index)
+
+
+# calculate_age over two date Series
+def age_between(date_of_birth, on):
+    before_birthday = (on.dt.month * 100 + on.dt.day) < (date_of_birth.dt.month * 100 + date_of_birth.dt.day)
+    return _integers((on.dt.year - date_of_birth.dt.year - before_birthday).to_numpy(dtype=float), on.index)
+
+
+def _dates(frame, column):
+    if column not in frame:
+        return pd.Series(pd.NaT, index=frame.index)
+    return pd.to_datetime(frame[column], format="%Y-%m-%d", errors="coerce")
+
+
+# Recompute Age (at the follow-up date), Follow_up_time and, where the event
+# date is stored, each time_to_* column. Values without the dates they depend
+# on are left as they were. Returns a new frame.
+def derive(frame):
+    frame = frame.copy()
+    radiotherapy = _month_index(_dates(frame, "Date_of_Last_Radiotherapy"))
+    follow_up = _dates(frame, "Follow_up_date")
+
+    def months_since_radiotherapy(dates):
+        return _integers(_month_index(dates) - radiotherapy, frame.index)
+
+    updates = {
+        "Age": age_between(_dates(frame, "Date_of_Birth"), follow_up),
+        "Follow_up_time": months_since_radiotherapy(follow_up),
+    }
+    for column, date_column in EVENTS.items():
+        updates[column] = months_since_radiotherapy(_dates(frame, date_column))
+
+    for column, values in updates.items():
+        known = values.notna()
+        if column not in frame or known.all():
+            frame[column] = values
+        elif known.any():
+            frame[column] = np.where(known, values.to_numpy(dtype=object), frame[column].to_numpy(dtype=object))
+    return frame
@@ -0,0 +1,109 @@
+# In-progress form records ("drafts"), keyed by MRN.
+#
+# Each Calculate stores only the fields that changed since the last one. The
+# changes are held in memory and written to a small local SQLite file after
+# DEBOUNCE seconds of quiet, so bursts of edits cost one write. A draft
+# survives browser reconnects and restarts until commit() saves it to the
+# registry in one step, or discard() drops it.
+
+import json
+import sqlite3
+import threading
+from datetime import date
+
+from registry import form, store
+from registry.schema import KEY
+
+# Draft file, kept apart from the registry itself
+path = "registry.drafts.db"
+
+# Seconds without changes before pending changes are written
+DEBOUNCE = 2.0
+
+_lock = threading.Lock()
+_pending = {}
+_timer = None
+_conn = {"path": None, "conn": None}
+
+
+def _connect():
+    if _conn["path"] != path:
+        conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS drafts (mrn TEXT PRIMARY KEY, data TEXT NOT NULL, updated TEXT NOT NULL)")
+        _conn.update(path=path, conn=conn)
+    return _conn["conn"]
+
+
+# Widget values as JSON: dates as ISO strings
+def _plain(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def _stored(mrn):
+    row = _connect().execute("SELECT data FROM drafts WHERE mrn = ?", (mrn,)).fetchone()
+    return json.loads(row[0]) if row else {}
+
+
+# The draft for an MRN (stored fields with pending changes applied), or None
+def get(mrn):
+    mrn = str(mrn).strip()
+    with _lock:
+        draft = {**_stored(mrn), **_pending.get(mrn, {})}
+    return draft or None
+
+
+# Record the widget values for an MRN; only fields that differ from the draft
+# are kept. Returns the changed fields.
+def update(mrn, values):
+    global _timer
+    mrn = str(mrn).strip()
+    values = {column: _plain(value) for column, value in values.items()}
+    with _lock:
+        draft = {**_stored(mrn), **_pending.get(mrn, {})}
+        changes = {column: value for column, value in values.items() if draft.get(column) != value}
+        if changes:
+            _pending.setdefault(mrn, {}).update(changes)
+            if _timer is not None:
+                _timer.cancel()
+            _timer = threading.Timer(DEBOUNCE, flush)
+            _timer.daemon = True
+            _timer.start()
+    return changes
+
+
+# Write pending changes now
+def flush():
+    with _lock:
+        if not _pending:
+            return
+        conn = _connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO drafts (mrn, data, updated) VALUES (?, ?, datetime('now')) "
+                "ON CONFLICT(mrn) DO UPDATE SET data = json_patch(data, excluded.data), updated = excluded.updated",
+                [(mrn, json.dumps(changes)) for mrn, changes in _pending.items()],
+            )
+        _pending.clear()
+
+
+def discard(mrn):
+    mrn = str(mrn).strip()
+    with _lock:
+        _pending.pop(mrn, None)
+        conn = _connect()
+        with conn:
+            conn.execute("DELETE FROM drafts WHERE mrn = ?", (mrn,))
+
+
+# Save an MRN's draft to the registry, as `user` in the change log, and drop
+# it. Returns the saved record, or None if there is no draft.
+def commit(mrn, user=None):
+    draft = get(mrn)
+    if draft is None:
+        return None
+    data = form.record(form.prefill(draft=draft))
+    data[KEY] = str(mrn).strip()
+    store.save_data(data, user=user)
+    discard(mrn)
+    return data
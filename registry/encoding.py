@@ -0,0 +1,139 @@
+# Compact typed encoding for the registry frame.
+#
+# Radio fields become pandas Categoricals (CTCAE grades as ordered ones, so
+# "grade >= III" is a comparison on integer codes), and multiselect fields
+# become a bitmask with one bit per form option instead of a stringified
+# Python list. decode() turns an encoded frame back into the stored form.
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from registry.options import MULTI_CHOICE, SINGLE_CHOICE, TOXICITY_FIELDS
+
+# Severity of each CTCAE answer; "None"/"Absent" is grade 0
+GRADE_RANK = {"None": 0, "Absent": 0, "Present": 1, "I": 1, "II": 2, "III": 3, "IV": 4, "V": 5}
+
+_LIST_PUNCTUATION = r"[\[\]()'\"]"
+
+
+def _bits(column):
+    return {item: 1 << position for position, item in enumerate(MULTI_CHOICE[column])}
+
+
+# Items of one stored multiselect value, e.g. "['35Gy', 'Others']"
+def parse_items(value):
+    if not isinstance(value, str):
+        return []
+    return [item for item in (part.strip() for part in re.sub(_LIST_PUNCTUATION, "", value).split(",")) if item]
+
+
+# Stored values may come back as numbers (e.g. ISUP 3 or 3.0 from a workbook)
+def _text(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# A radio column as a Categorical with the form's options as categories
+# (ordered by severity for CTCAE grades). Values outside the options are kept
+# as extra categories rather than lost.
+def encode_choice(values, column):
+    options = SINGLE_CHOICE[column]
+    if column in TOXICITY_FIELDS:
+        options = sorted(options, key=lambda option: GRADE_RANK[option])
+    uniques = values.dropna().unique()
+    if not all(isinstance(value, str) for value in uniques):
+        values = values.map({value: _text(value) for value in uniques})
+        uniques = values.dropna().unique()
+    extra = sorted(set(uniques) - set(options))
+    return pd.Series(pd.Categorical(values, categories=options + extra, ordered=column in TOXICITY_FIELDS), index=values.index)
+
+
+# A multiselect column as a nullable bitmask of the form's options. Columns
+# holding items outside the options are left as they are.
+def encode_multiselect(values, column):
+    bits = _bits(column)
+    masks = {}
+    for value in values.dropna().unique():
+        items = parse_items(value)
+        if any(item not in bits for item in items):
+            return values
+        masks[value] = sum(bits[item] for item in set(items))
+    encoded = values.map(masks)
+    return pd.Series(pd.array(encoded, dtype="UInt32"), index=values.index)
+
+
+def decode_multiselect(masks, column):
+    options = MULTI_CHOICE[column]
+    texts = {
+        mask: str([item for position, item in enumerate(options) if int(mask) >> position & 1])
+        for mask in masks.dropna().unique()
+    }
+    return masks.astype(object).map(texts)
+
+
+def is_encoded_multiselect(values):
+    return pd.api.types.is_integer_dtype(values.dtype)
+
+
+def encode(frame):
+    frame = frame.copy()
+    for column in SINGLE_CHOICE:
+        if column in frame:
+            frame[column] = encode_choice(frame[column], column)
+    for column in MULTI_CHOICE:
+        if column in frame:
+            frame[column] = encode_multiselect(frame[column], column)
+    return frame
+
+
+def decode(frame):
+    columns = {}
+    for column in frame.columns:
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        elif column in MULTI_CHOICE and is_encoded_multiselect(values):
+            values = decode_multiselect(values, column)
+        columns[column] = values
+    return pd.DataFrame(columns, index=frame.index)
+
+
+# Rows whose CTCAE grade for `column` is at least `grade`, e.g. grade_at_least(df, "Proctitis", "III")
+def grade_at_least(frame, column, grade):
+    values = frame[column]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Rank each category once, then look the codes up
+        ranks = np.array([GRADE_RANK.get(category, -1) for category in values.cat.categories] + [-1])
+        return ranks[values.cat.codes.to_numpy()] >= GRADE_RANK[grade]
+    return values.map(GRADE_RANK).astype(float).ge(GRADE_RANK[grade]).to_numpy()
+
+
+# Rows whose multiselect `column` includes any of `items`
+def has_any(frame, column, items):
+    values = frame[column]
+    if not is_encoded_multiselect(values):
+        values = encode_multiselect(values, column)
+    if is_encoded_multiselect(values):
+        bits = _bits(column)
+        wanted = sum(bits[item] for item in items)
+        return (values.fillna(0).to_numpy(dtype=np.int64) & wanted) != 0
+    wanted = set(items)
+    return values.map(lambda value: bool(wanted.intersection(parse_items(value)))).to_numpy()
+
+
+# Multiselect as a child table: one row per (row label, item)
+def explode(frame, column):
+    values = frame[column]
+    if is_encoded_multiselect(values):
+        masks = values.fillna(0).to_numpy(dtype=np.int64)
+        parts = [
+            pd.Series(item, index=values.index[(masks >> position) & 1 == 1])
+            for position, item in enumerate(MULTI_CHOICE[column])
+        ]
+        items = pd.concat(parts) if parts else pd.Series(dtype=object)
+        return items.sort_index(kind="stable")
+    parsed = {value: parse_items(value) for value in values.dropna().unique()}
+    return values.map(parsed).explode().dropna()
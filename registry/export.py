@@ -0,0 +1,134 @@
+# Point-in-time exports of the registry as Excel, CSV or Parquet.
+#
+# An export captures the registry frame current when it is requested (later
+# saves don't change it) and writes it chunk by chunk on a background thread,
+# so building a large export neither holds a second full copy of the registry
+# in memory nor blocks data entry. Files are written next to their target and
+# swapped in when complete, so nobody ever copies a half-written export.
+
+import os
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from registry import encoding, metrics, store
+from registry.index import VISIT_DATE
+from registry.options import MULTI_CHOICE, NUMERIC_RANGES
+from registry.schema import KEY
+
+FORMATS = {"xlsx": "Excel", "csv": "CSV", "parquet": "Parquet"}
+
+# Where exports requested from the app are written
+directory = "exports"
+
+# Rows decoded and written at a time
+CHUNKSIZE = 10000
+
+# One export at a time, off the request path
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="registry-export")
+
+
+# Rows of `frame` matching the filters: follow-up date within [since, until],
+# MRN in `mrns`, and for each column in `where` a value (or, for a
+# multiselect, any selected item) among the allowed ones
+def select(frame, since=None, until=None, mrns=None, where=None):
+    keep = pd.Series(True, index=frame.index)
+    if since is not None or until is not None:
+        dates = pd.to_datetime(frame[VISIT_DATE], errors="coerce")
+        if since is not None:
+            keep &= dates >= pd.Timestamp(since)
+        if until is not None:
+            keep &= dates <= pd.Timestamp(until)
+    if mrns is not None:
+        keep &= frame[KEY].isin([str(mrn).strip() for mrn in mrns])
+    for column, allowed in (where or {}).items():
+        if column in MULTI_CHOICE:
+            keep &= encoding.has_any(frame, column, allowed)
+        else:
+            keep &= frame[column].astype(object).isin(list(allowed))
+    return frame.index[keep.to_numpy()]
+
+
+def _chunks(frame, rows):
+    for start in range(0, len(rows), CHUNKSIZE):
+        yield encoding.decode(frame.loc[rows[start:start + CHUNKSIZE]])
+
+
+def _write_csv(chunks, tmp, columns):
+    with open(tmp, "w", newline="", encoding="utf-8") as handle:
+        pd.DataFrame(columns=columns).to_csv(handle, index=False)
+        for chunk in chunks:
+            chunk.to_csv(handle, index=False, header=False)
+
+
+def _write_parquet(chunks, tmp, columns):
+    # Every chunk is written with the same schema: numbers as float64 and
+    # everything else as text, so values of mixed type in a column (common in
+    # workbook-era data) don't change the schema between chunks
+    schema = pa.schema([(column, pa.float64() if column in NUMERIC_RANGES else pa.string()) for column in columns])
+    with pq.ParquetWriter(tmp, schema) as writer:
+        for chunk in chunks:
+            data = {}
+            for column in columns:
+                if column in NUMERIC_RANGES:
+                    data[column] = pd.to_numeric(chunk[column], errors="coerce").astype(float)
+                else:
+                    data[column] = chunk[column].map(str, na_action="ignore").astype(object).where(chunk[column].notna(), None)
+            writer.write_table(pa.Table.from_pandas(pd.DataFrame(data), schema=schema, preserve_index=False))
+
+
+def _write_excel(chunks, tmp, columns):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    sheet.append(columns)
+    for chunk in chunks:
+        for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False):
+            sheet.append(list(row))
+    workbook.save(tmp)
+
+
+WRITERS = {"xlsx": _write_excel, "csv": _write_csv, "parquet": _write_parquet}
+
+
+# Write a snapshot of `frame` (the registry by default) to `path` in the
+# format given by its extension, filtered as in select(). Returns the number
+# of rows written.
+def write_snapshot(path, frame=None, **filters):
+    fmt = os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    if frame is None:
+        frame = store.load_data()
+    rows = select(frame, **filters)
+    root, ext = os.path.splitext(path)
+    tmp = root + ".exporting" + ext
+    try:
+        with metrics.span("export", format=fmt, rows=len(rows)) as fields:
+            WRITERS[fmt](_chunks(frame, rows), tmp, list(frame.columns))
+            fields["bytes"] = metrics.file_size(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return len(rows)
+
+
+# Start an export in the background. The registry is captured now; the
+# returned Future resolves to the row count once the file is in place.
+def submit(path, **filters):
+    return _executor.submit(write_snapshot, path, store.load_data(), **filters)
+
+
+# A new file name in the export directory, e.g. exports/registry-20240101-120000.csv
+def new_path(fmt):
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"registry-{datetime.now():%Y%m%d-%H%M%S}")
+    path, copy = f"{stem}.{fmt}", 1
+    while os.path.exists(path):
+        copy += 1
+        path = f"{stem}-{copy}.{fmt}"
+    return path
@@ -0,0 +1,221 @@
+# Declarative description of the patient form. The Streamlit app renders its
+# widgets from SECTIONS, prefills them with prefill() and saves record(), so
+# the form, the saved keys and the registry columns come from one place.
+# Everything here is built once per process, not on every rerun.
+
+from collections import namedtuple
+from datetime import date
+
+import pandas as pd
+
+from registry.ctcae import GRADE_DESCRIPTIONS
+from registry.derived import EVENTS, calculate_age, calculate_months
+from registry.encoding import parse_items
+from registry.options import MULTI_CHOICE, NUMERIC_RANGES, SINGLE_CHOICE
+from registry.schema import COLUMNS, KEY
+
+# column: registry column; kind: "text", "date", "number", "radio" or "multiselect";
+# default: value for a new patient (None = first option / today / 0);
+# bounds: (min, max) for dates and numbers, None = today for a date; note: warning shown below the widget;
+# prefill: filled in from the patient's stored data; when: (column, value) the field depends on
+Field = namedtuple("Field", "column label kind default bounds note prefill when", defaults=(None, None, None, False, None))
+
+# Dates missing from a stored patient are shown as this
+MISSING_DATE = date(1900, 1, 1)
+
+
+def _date(column, label, **kwargs):
+    return Field(column, label, "date", prefill=kwargs.pop("prefill", True), **kwargs)
+
+
+def _radio(column, label=None, **kwargs):
+    return Field(column, label or column, "radio", **kwargs)
+
+
+def _graded(column):
+    return _radio(column, column.replace("_", " ") + " (CTCAE v5)")
+
+
+def _multiselect(column, label=None):
+    return Field(column, label or column, "multiselect", prefill=True)
+
+
+def _number(column):
+    return Field(column, column, "number", bounds=NUMERIC_RANGES[column], prefill=True)
+
+
+def _event_date(column, label, event):
+    return _date(column, label, prefill=False, when=(event, "Yes"))
+
+
+# (subheader, fields, draw a divider before the section)
+SECTIONS = [
+    ("Patient Details", [
+        _date("Date_of_Birth", "Date of Birth", bounds=(date(1900, 1, 1), None)),
+        Field(KEY, "MRN (Medical Record Number)", "text", prefill=True),
+        _date("Date_of_Last_Radiotherapy", "Date of Last Radiotherapy"),
+        _date("Follow_up_date", "Date of Follow-up"),
+        _multiselect("Histology"),
+        _radio("ISUP", default="Not Reported", prefill=True),
+        _radio("Perineural_Invasion", prefill=True),
+        _radio("LVI", prefill=True),
+        _radio("High_Grade_PIN", "PIN", prefill=True, note="High-grade prostatic intraepithelial neoplasia (PIN)"),
+        _multiselect("Clinical Stage"),
+        _date("Biopsy_date", "Date of Biopsy"),
+        _number("IPSS")._replace(note="Not sure how to calculate the IPSS? Click [here](https://www.mdcalc.com/calc/10462/american-urological-association-symptom-index-aua-si#why-use) to use the official AUA Symptom Index calculator."),
+        _number("iPSA"),
+    ], False),
+    ("Systemic Treatment", [
+        _multiselect("Androgen_Deprivation_Therapy"),
+        _date("ADT_first_date", "First Date of ADT"),
+        _date("ADT_last_date", "Last Date of ADT"),
+        _multiselect("Use_of_ARATs_or_CYP17A1_inhibitor", "ARATs or CYP17A1 Inhibitor"),
+        _date("ARATs_first_date", "First Date of ARATs"),
+        _date("ARATs_last_date", "Last Date of ARATs"),
+        _multiselect("Chemotherapy"),
+        _date("Chemotherapy_first_date", "First Date of Chemotherapy"),
+        _date("Chemotherapy_last_date", "Last Date of Chemotherapy"),
+        _multiselect("Radioligant_Therapy", "Radioligant Therapy"),
+        _date("Radioligant_Therapy_first_date", "First Date of Radioligant Therapy"),
+        _date("Radioligant_Therapy_last_date", "Last Date of Radioligant Therapy"),
+    ], False),
+    ("Treatment Details", [
+        _multiselect("Dose"),
+        _multiselect("Volume"),
+    ], False),
+    ("Urinary Side Effects", [
+        _radio("Fatigue"),
+        _graded("Dysuria"), _graded("Cystitis"), _graded("Bladder_Perforation"), _graded("Bladder_Spasms"),
+        _graded("Hematuria"), _graded("Urinary_Fistula"), _graded("Urinary_Frequency"), _graded("Urinary_Incontinence"),
+        _graded("Urinary_Retention"), _graded("Urinary_Obstruction"), _graded("Urinary_Urgency"),
+    ], True),
+    ("Gastrointestinal Side Effects", [
+        _graded("Diarrhea"), _graded("Nausea"), _graded("Proctitis"), _graded("Rectal_Fistula"),
+        _graded("Rectal_Hemorrhage"), _graded("Rectal_Pain"), _radio("Rectal_perforation", "Rectal Perforation (CTCAE v5)"), _graded("Rectal_Stenosis"),
+    ], False),
+    ("Sexual Side Effects", [
+        _graded("Erectile_Dysfunction"), _graded("Gynecomastia"), _graded("Ejaculation_Disorder"),
+        _graded("Testosterone_deficiency"),
+        _radio("Overal_tolerance", "Overall Tolerance"),
+    ], False),
+    ("Recurrence Details", [
+        _radio("biochemical_recurrence", "Biochemical Recurrence"),
+        _radio("local_recurrence", "Local Recurrence"),
+        _radio("regional_recurrence", "Regional Recurrence"),
+        _radio("distant_recurrence", "Distant Recurrence"),
+        _radio("death", "Death"),
+        _event_date("biochemical_recurrence_date", "Date of Biochemical Recurrence", "biochemical_recurrence"),
+        _event_date("local_recurrence_date", "Date of Local Recurrence", "local_recurrence"),
+        _event_date("regional_recurrence_date", "Date of Regional Recurrence", "regional_recurrence"),
+        _event_date("distant_recurrence_date", "Date of Distant Recurrence", "distant_recurrence"),
+        _radio("Cancer_related_death", "Cancer Related Death", when=("death", "Yes")),
+        _event_date("death_date", "Date of Death", "death"),
+    ], False),
+]
+
+FIELDS = {field.column: field for _, fields, _ in SECTIONS for field in fields}
+
+# Computed from the form's dates rather than entered
+DERIVED_COLUMNS = ["Age", "Follow_up_time"] + list(EVENTS)
+
+# Grade reference shown in an expander under a field, as one markdown block
+REFERENCE = {
+    column: (FIELDS[column].label.replace(" (CTCAE v5)", "") + " Classification", "  \n".join(lines))
+    for column, lines in GRADE_DESCRIPTIONS.items()
+}
+
+# The form may only save registry columns, so load_data() returns exactly what was entered
+_unknown = [column for column in list(FIELDS) + DERIVED_COLUMNS if column not in COLUMNS]
+if _unknown:
+    raise ValueError(f"Form fields missing from the registry schema: {_unknown}")
+
+
+def options(field):
+    if field.kind == "radio":
+        return SINGLE_CHOICE[field.column]
+    if field.kind == "multiselect":
+        return MULTI_CHOICE[field.column]
+    return None
+
+
+# Whether a conditional field is shown for the current widget values
+def is_shown(field, values):
+    return field.when is None or values.get(field.when[0]) == field.when[1]
+
+
+def _initial(field):
+    if field.kind == "radio":
+        return field.default or options(field)[0]
+    if field.kind == "multiselect":
+        return []
+    if field.kind == "date":
+        return date.today()
+    if field.kind == "number":
+        return 0
+    return ""
+
+
+def _stored(field, value):
+    if field.kind == "date":
+        # Stored dates are ISO strings; anything else (e.g. workbook timestamps) goes through pandas
+        if isinstance(value, str):
+            try:
+                return date.fromisoformat(value[:10])
+            except ValueError:
+                pass
+        parsed = pd.to_datetime(value, errors="coerce")
+        return MISSING_DATE if pd.isna(parsed) else parsed.date()
+    if field.kind == "multiselect":
+        items = value if isinstance(value, list) else parse_items(value)
+        return [item for item in items if item in options(field)]
+    if pd.isna(value):
+        return _initial(field)
+    if field.kind == "number":
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return _initial(field)
+    if field.kind == "radio":
+        text = str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+        return text if text in options(field) else _initial(field)
+    return str(value)
+
+
+# Initial widget values: the patient's stored details where the field is
+# prefilled, the field defaults otherwise, and any unsaved draft on top
+def prefill(data=None, draft=None):
+    values = {}
+    for column, field in FIELDS.items():
+        if draft and draft.get(column) is not None:
+            values[column] = _stored(field, draft[column])
+        elif data is not None and field.prefill:
+            values[column] = _stored(field, data.get(column))
+        else:
+            values[column] = _initial(field)
+    return values
+
+
+# Age, follow-up time and time to each recorded event, from the widget values
+def derived_values(values):
+    radiotherapy = values["Date_of_Last_Radiotherapy"]
+    derived = {
+        "Age": calculate_age(values["Date_of_Birth"], values["Follow_up_date"]),
+        "Follow_up_time": calculate_months(radiotherapy, values["Follow_up_date"]),
+    }
+    for column, event_date in EVENTS.items():
+        shown = is_shown(FIELDS[event_date], values) and values.get(event_date) is not None
+        derived[column] = calculate_months(radiotherapy, values[event_date]) if shown else None
+    return derived
+
+
+# The record save_data() stores for these widget values: one key per form
+# field (None where a conditional field isn't shown) plus the derived fields
+def record(values):
+    data = {}
+    for column, field in FIELDS.items():
+        value = values.get(column) if is_shown(field, values) else None
+        if field.kind == "date" and value is not None:
+            value = value.strftime("%Y-%m-%d")
+        data[column] = value
+    data.update(derived_values(values))
+    return data
@@ -0,0 +1,50 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+from registry.schema import KEY
+
+VISIT_DATE = "Follow_up_date"
+
+
+# Sort key for each visit: its follow-up date in ns. Missing or unparseable
+# dates become NaT, whose integer value is the minimum, so they sort first.
+def visit_sort_keys(frame):
+    if VISIT_DATE not in frame:
+        return np.full(len(frame), np.iinfo(np.int64).min, dtype=np.int64)
+    dates = pd.to_datetime(frame[VISIT_DATE], errors="coerce")
+    return dates.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+
+# MRN -> positions of that patient's rows in the registry frame, ordered by
+# follow-up date (then by position, i.e. save order). The registry is
+# append-only, so the index is built once per frame and then extended with
+# the rows appended since.
+class MrnIndex:
+    def __init__(self):
+        self._visits = {}
+        self.size = 0
+
+    # Index rows frame[self.size:]
+    def extend(self, frame):
+        if len(frame) <= self.size:
+            return
+        new = frame.iloc[self.size:]
+        keys = visit_sort_keys(new)
+        positions = np.arange(self.size, len(frame))
+        mrns = new[KEY].to_numpy()
+        # Insert in date order so building from scratch only ever appends
+        for i in np.lexsort((positions, keys)):
+            bisect.insort(self._visits.setdefault(mrns[i], []), (int(keys[i]), int(positions[i])))
+        self.size = len(frame)
+
+    # Row positions for an MRN, oldest visit first
+    def positions(self, mrn):
+        return [position for _, position in self._visits.get(mrn, ())]
+
+    def __contains__(self, mrn):
+        return mrn in self._visits
+
+    def __len__(self):
+        return len(self._visits)
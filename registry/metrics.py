@@ -0,0 +1,107 @@
+# Timing spans for the registry's hot paths (loading, lookups, saves,
+# rendering, exports), with row counts and file sizes.
+#
+#     with metrics.span("load_data") as fields:
+#         frame = ...
+#         fields["rows"] = len(frame)
+#
+# The most recent spans are kept in memory for the admin page and summary();
+# each one is also logged as a JSON line on the "registry.metrics" logger, so
+# production can route them anywhere logging can.
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+logger = logging.getLogger("registry.metrics")
+
+# Set to False to turn spans into no-ops
+enabled = True
+
+# Spans kept in memory
+HISTORY = 5000
+
+_lock = threading.Lock()
+_spans = deque(maxlen=HISTORY)
+
+
+# Size of a file in bytes (with its -wal file for SQLite), None if it is missing
+def file_size(path):
+    total = None
+    for name in (path, path + "-wal"):
+        try:
+            total = (total or 0) + os.path.getsize(name)
+        except OSError:
+            pass
+    return total
+
+
+# Time the block; the yielded dict takes extra fields such as rows or bytes
+@contextmanager
+def span(name, **fields):
+    if not enabled:
+        yield fields
+        return
+    started = time.perf_counter()
+    error = None
+    try:
+        yield fields
+    except BaseException as exc:
+        error = type(exc).__name__
+        raise
+    finally:
+        record = {
+            "time": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "span": name,
+            "ms": round((time.perf_counter() - started) * 1000, 3),
+            "thread": threading.current_thread().name,
+            **fields,
+        }
+        if error:
+            record["error"] = error
+        with _lock:
+            _spans.append(record)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps(record, default=str))
+
+
+# Recorded spans, oldest first, optionally only those named `name`
+def spans(name=None):
+    with _lock:
+        records = list(_spans)
+    return [record for record in records if name is None or record["span"] == name]
+
+
+def clear():
+    with _lock:
+        _spans.clear()
+
+
+# Per span name: count, mean / p50 / p95 / max milliseconds and the latest row count and file size
+def summary():
+    import numpy as np
+    import pandas as pd  # not at module level: spans are recorded from the app's first lines
+    frame = pd.DataFrame(spans())
+    if frame.empty:
+        return pd.DataFrame(columns=["count", "mean_ms", "p50_ms", "p95_ms", "max_ms", "rows", "bytes"])
+    grouped = frame.groupby("span", sort=True)
+    table = pd.DataFrame({
+        "count": grouped["ms"].size(),
+        "mean_ms": grouped["ms"].mean(),
+        "p50_ms": grouped["ms"].median(),
+        "p95_ms": grouped["ms"].quantile(0.95),
+        "max_ms": grouped["ms"].max(),
+    })
+    for column in ("rows", "bytes"):
+        table[column] = grouped[column].last() if column in frame else np.nan
+    return table.round(2)
+
+
+# The recorded spans as JSON lines, e.g. for download
+def spans_jsonl():
+    return "".join(json.dumps(record, default=str) + "\n" for record in spans())
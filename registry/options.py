@@ -0,0 +1,94 @@
+# Choices offered by the form widgets, keyed by registry column. The app
+# builds its widgets from these and imports validate against them, so both
+# accept exactly the same values.
+
+ISUP = ["1", "2", "3", "4", "5", "Not Reported"]
+YES_NO = ["No", "Yes"]
+
+# Single-choice (radio) fields
+SINGLE_CHOICE = {
+    "ISUP": ISUP,
+    "Perineural_Invasion": ["Negative", "Positive", "Not Reported"],
+    "LVI": ["Negative", "Positive"],
+    "High_Grade_PIN": ["Absent", "Present", "Not Reported"],
+    # Urinary side effects (CTCAE v5 grades)
+    "Fatigue": ["None", "I", "II", "III"],
+    "Dysuria": ["Present", "Absent"],
+    "Cystitis": ["None", "I", "II", "III", "IV", "V"],
+    "Bladder_Perforation": ["Absent", "II", "III", "IV", "V"],
+    "Bladder_Spasms": ["Absent", "I", "II", "III"],
+    "Hematuria": ["Absent", "I", "II", "III", "IV", "V"],
+    "Urinary_Fistula": ["Absent", "II", "III", "IV", "V"],
+    "Urinary_Frequency": ["Absent", "I", "II"],
+    "Urinary_Incontinence": ["Absent", "I", "II", "III"],
+    "Urinary_Retention": ["Absent", "I", "II", "III", "IV", "V"],
+    "Urinary_Obstruction": ["Absent", "I", "II", "III", "IV", "V"],
+    "Urinary_Urgency": ["Absent", "I", "II"],
+    # Gastrointestinal side effects
+    "Diarrhea": ["Absent", "I", "II", "III", "IV", "V"],
+    "Nausea": ["Absent", "I", "II", "III", "IV", "V"],
+    "Proctitis": ["Absent", "I", "II", "III", "IV", "V"],
+    "Rectal_Fistula": ["Absent", "I", "II", "III", "IV", "V"],
+    "Rectal_Hemorrhage": ["Absent", "I", "II", "III", "IV", "V"],
+    "Rectal_Pain": ["Absent", "I", "II", "III"],
+    "Rectal_perforation": ["Absent", "II", "III", "IV", "V"],
+    "Rectal_Stenosis": ["Absent", "I", "II", "III", "IV", "V"],
+    # Sexual side effects
+    "Erectile_Dysfunction": ["Absent", "I", "II", "III"],
+    "Gynecomastia": ["Absent", "I", "II", "III"],
+    "Ejaculation_Disorder": ["Absent", "I", "II"],
+    "Testosterone_deficiency": ["Absent", "I", "II"],
+    "Overal_tolerance": ["Excellent", "Good", "Fair", "Poor"],
+    # Recurrence
+    "biochemical_recurrence": YES_NO,
+    "local_recurrence": YES_NO,
+    "regional_recurrence": YES_NO,
+    "distant_recurrence": YES_NO,
+    "death": YES_NO,
+    "Cancer_related_death": YES_NO,
+}
+
+# CTCAE-graded side effects
+TOXICITY_FIELDS = [
+    "Fatigue", "Dysuria", "Cystitis", "Bladder_Perforation", "Bladder_Spasms", "Hematuria", "Urinary_Fistula",
+    "Urinary_Frequency", "Urinary_Incontinence", "Urinary_Retention", "Urinary_Obstruction", "Urinary_Urgency",
+    "Diarrhea", "Nausea", "Proctitis", "Rectal_Fistula", "Rectal_Hemorrhage", "Rectal_Pain", "Rectal_perforation", "Rectal_Stenosis",
+    "Erectile_Dysfunction", "Gynecomastia", "Ejaculation_Disorder", "Testosterone_deficiency",
+]
+
+# Yes/No events recorded at follow-up
+RECURRENCE_FIELDS = ["biochemical_recurrence", "local_recurrence", "regional_recurrence", "distant_recurrence", "death"]
+
+# Multiselect fields
+MULTI_CHOICE = {
+    "Histology": ["Acinar Adenocarcinoma", "Adenoid Cystic Carcinoma", "Adenosquamous Carcinoma", "Apocrine Carcinoma", "Cribriform Carcinoma", "Ductal Carcinoma", "Invasive Lobular Carcinoma", "Medullary Carcinoma", "Metaplastic Carcinoma", "Mucinous Carcinoma", "Neuroendocrine Carcinoma", "Papillary Carcinoma", "Squamous Cell Carcinoma", "Tubular Carcinoma", "Others"],
+    "Clinical Stage": ["cT1a", "cT1b", "cT1c", "cT2a", "cT2b", "cT2c", "cT3a", "cT3b", "cT4", "cN0", "cN1", "M0", "M1"],
+    "Androgen_Deprivation_Therapy": ["LHRH Agonist", "LHRH Antagonist", "Orchiectomy", "Antiandrogen", "Combination Therapy", "None"],
+    "Use_of_ARATs_or_CYP17A1_inhibitor": ["None", "Abiraterone", "Enzalutamide", "Apalutamide", "Darolutamide"],
+    "Chemotherapy": ["None", "Docetaxel", "Cabazitaxel", "Mitoxantrone", "Carboplatin", "Cisplatin", "Vinblastine", "Vinorelbine", "Paclitaxel", "Etoposide", "Gemcitabine", "Ifosfamide", "Methotrexate", "Mitomycin", "Pemetrexed", "Topotecan", "Vincristine", "Others"],
+    "Radioligant_Therapy": ["None", "Radium-223", "Lu-177", "Ac-225", "Others"],
+    "Dose": ["35Gy", "36.25Gy", "25Gy", "40Gy", "Others"],
+    "Volume": ["Partial Prostate", "Whole Prostate", "Proximal SV", "Whole SV", "Nodal Elective", "Nodal Boost", "Bony boost", "Others"],
+}
+
+# Date fields, stored as YYYY-MM-DD
+DATE_COLUMNS = [
+    "Date_of_Birth", "Date_of_Last_Radiotherapy", "Follow_up_date", "Biopsy_date",
+    "ADT_first_date", "ADT_last_date", "ARATs_first_date", "ARATs_last_date",
+    "Chemotherapy_first_date", "Chemotherapy_last_date",
+    "Radioligant_Therapy_first_date", "Radioligant_Therapy_last_date",
+    "biochemical_recurrence_date", "local_recurrence_date", "regional_recurrence_date", "distant_recurrence_date", "death_date",
+]
+
+# Numeric fields and their allowed range (None = unbounded)
+NUMERIC_RANGES = {
+    "Age": (0, 130),
+    "Follow_up_time": (None, None),
+    "IPSS": (0, 35),
+    "iPSA": (0, 10000),
+    "time_to_biochemical_recurrence": (None, None),
+    "time_to_local_recurrence": (None, None),
+    "time_to_regional_recurrence": (None, None),
+    "time_to_distant_recurrence": (None, None),
+    "time_to_death": (None, None),
+}
@@ -0,0 +1,327 @@
+# Registry-wide data-quality checks. Each check is a vectorised pass over a
+# whole stored table, so a registry of 100k visits is checked in seconds:
+#
+#   schema      values saved under legacy keys (see schema.LEGACY_KEYS) or
+#               under columns the registry doesn't have
+#   domain      values that aren't one of the form's options, numbers out of
+#               range, dates not stored as YYYY-MM-DD, and values the old
+#               form saved ambiguously
+#   dates       impossible orderings: a treatment ending before it started,
+#               a follow-up before radiotherapy, ...
+#   duplicates  the same visit saved more than once
+#
+# check() reports one row per issue. repair() fixes only what needs no
+# clinical judgement (legacy keys folded into their column, options and dates
+# rewritten in their stored form, the old form's "N/A" cleared, exact
+# duplicate visits dropped) by
+# rewriting the stored tables; everything else is left for review.
+#
+#   python -m registry.quality --report quality.csv [--repair]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from registry import audit, metrics, store
+from registry.encoding import parse_items
+from registry.form import MISSING_DATE
+from registry.index import VISIT_DATE
+from registry.options import DATE_COLUMNS, MULTI_CHOICE, NUMERIC_RANGES, SINGLE_CHOICE
+from registry.schema import COLUMNS, KEY, LEGACY_KEYS, PATIENT_COLUMNS, canonical_frame
+
+# One row per issue: the stored table, the row's position in it, its MRN, the
+# check, the column and stored value, what is wrong and what repair() would do
+# ("" if it needs review)
+ISSUE_COLUMNS = ["table", "row", KEY, "check", "column", "value", "message", "repair"]
+
+# Options that can't be trusted in rows saved by the old single-table form,
+# and why. It offered Rectal_Fistula as ["Absent", "I" "II", "III", ...]: the
+# missing comma made "I" and "II" a second "III".
+SUSPECT = {
+    ("Rectal_Fistula", "III"): "may be grade I or II saved by the old form (it offered \"III\" twice)",
+}
+
+# What the old form saved for fields that didn't apply
+NOT_APPLICABLE = "N/A"
+
+# (earlier, later) dates in a patient's details
+DATE_ORDER = [
+    ("ADT_first_date", "ADT_last_date"),
+    ("ARATs_first_date", "ARATs_last_date"),
+    ("Chemotherapy_first_date", "Chemotherapy_last_date"),
+    ("Radioligant_Therapy_first_date", "Radioligant_Therapy_last_date"),
+    ("Date_of_Birth", "Biopsy_date"),
+    ("Date_of_Birth", "Date_of_Last_Radiotherapy"),
+]
+
+# Follow-up visits are after this date
+RADIOTHERAPY = "Date_of_Last_Radiotherapy"
+
+
+def _issues(table, frame, mask, check, column, message, repair="", values=None):
+    rows = np.flatnonzero(np.asarray(mask, dtype=bool))
+    if not isinstance(repair, str):
+        repair = np.asarray(repair, dtype=object)[rows]
+    return pd.DataFrame({
+        "table": table, "row": rows, KEY: frame[KEY].to_numpy()[rows], "check": check, "column": column,
+        "value": np.asarray(frame[column] if values is None else values, dtype=object)[rows],
+        "message": message, "repair": repair,
+    }, columns=ISSUE_COLUMNS)
+
+
+# Stored values as stripped strings, missing stays missing. Columns repeat a
+# few values (options, dates), so each distinct value is converted once.
+def _text(values):
+    codes, uniques = pd.factorize(values)
+    text = np.append(pd.Series(uniques, dtype=object).astype(str).str.strip().to_numpy(dtype=object), np.nan)
+    return pd.Series(text[codes], index=values.index)
+
+
+# Option spellings that mean the same: case, and numbers saved as floats ("1.0")
+def _option_key(text):
+    return text.str.lower().str.replace(r"\.0$", "", regex=True)
+
+
+# YYYY-MM-DD dates; anything else, and the form's "not set" date, is NaT
+def _dates(frame, column):
+    if column not in frame:
+        return pd.Series(pd.NaT, index=frame.index)
+    dates = pd.to_datetime(frame[column], format="%Y-%m-%d", errors="coerce")
+    return dates.where(dates != pd.Timestamp(MISSING_DATE))
+
+
+# Issues refer to rows by position; stored frames are usually indexed that way already
+def _by_position(frame):
+    return frame if frame.index.equals(pd.RangeIndex(len(frame))) else frame.reset_index(drop=True)
+
+
+def _schema(table, raw):
+    issues = []
+    for legacy, column in LEGACY_KEYS.items():
+        if legacy not in raw:
+            continue
+        saved = raw[legacy].notna()
+        conflict = saved & raw[column].notna() & (_text(raw[column]) != _text(raw[legacy])) if column in raw else saved & False
+        issues.append(_issues(table, raw, saved & ~conflict, "schema", legacy, f"saved under the legacy key for {column}", f"move to {column}"))
+        issues.append(_issues(table, raw, conflict, "schema", legacy, f"differs from {column}, saved in the same row", f"keep {column}"))
+    for column in raw.columns:
+        if column not in COLUMNS and column not in LEGACY_KEYS:
+            issues.append(_issues(table, raw, raw[column].notna(), "schema", column, "not a registry column"))
+    return issues
+
+
+# Visits saved before the registry was split carry the patient's details
+# themselves; the form was fixed after the split, so only those rows can hold
+# its ambiguous values
+def _saved_by_old_form(frame):
+    static = [column for column in PATIENT_COLUMNS if column != KEY and column in frame]
+    if not static:
+        return pd.Series(False, index=frame.index)
+    return frame[static].notna().any(axis=1)
+
+
+# Returns the issues and the values repair() sets: {column: Series by position}
+def _domain(table, frame):
+    issues, fixes = [], {}
+
+    def fix(column, values):
+        fixes[column] = pd.concat([fixes[column], values]) if column in fixes else values
+
+    # The old form saved "N/A" where a field didn't apply (e.g. the time to an
+    # event that didn't happen). It means missing, so it is cleared rather
+    # than reported as a bad value by the checks below.
+    checked = frame.columns.intersection(list(SINGLE_CHOICE) + list(MULTI_CHOICE) + list(NUMERIC_RANGES) + DATE_COLUMNS)
+    cleared = {}
+    for column in checked:
+        if NOT_APPLICABLE in SINGLE_CHOICE.get(column, ()):
+            continue
+        marked = frame[column].eq(NOT_APPLICABLE)
+        if marked.any():
+            issues.append(_issues(table, frame, marked, "domain", column, "the old form's \"not applicable\" marker", "clear"))
+            fix(column, pd.Series(None, index=np.flatnonzero(marked), dtype=object))
+            cleared[column] = frame[column].where(~marked)
+    if cleared:
+        frame = frame.assign(**cleared)
+
+    for column in frame.columns.intersection(list(SINGLE_CHOICE)):
+        options = SINGLE_CHOICE[column]
+        values = frame[column]
+        invalid = values.notna() & ~values.isin(options)
+        if invalid.any():
+            spellings = dict(zip(_option_key(pd.Series(options)), options))
+            fixed = _option_key(_text(values.where(invalid))).map(spellings)
+            fixable = invalid & fixed.notna()
+            issues.append(_issues(table, frame, fixable, "domain", column, "not written as the form's option", "set to " + fixed.astype(str)))
+            issues.append(_issues(table, frame, invalid & ~fixable, "domain", column, "not one of the form's options"))
+            if fixable.any():
+                fix(column, fixed[fixable])
+        for (suspect_column, value), message in SUSPECT.items():
+            if suspect_column == column and (values == value).any():
+                issues.append(_issues(table, frame, (values == value) & _saved_by_old_form(frame), "domain", column, message))
+
+    for column in frame.columns.intersection(list(MULTI_CHOICE)):
+        # Each distinct stored list is split once
+        codes, uniques = pd.factorize(frame[column])
+        items = pd.Series([parse_items(str(value)) for value in uniques], dtype=object).explode()
+        items = items[items.notna()]
+        unknown = items.index[~items.isin(MULTI_CHOICE[column])].unique()
+        issues.append(_issues(table, frame, np.isin(codes, unknown), "domain", column, "contains a value that is not one of the form's options"))
+
+    for column in frame.columns.intersection(list(NUMERIC_RANGES)):
+        numbers = pd.to_numeric(frame[column], errors="coerce")
+        low, high = NUMERIC_RANGES[column]
+        invalid = frame[column].notna() & numbers.isna()
+        if low is not None:
+            invalid |= numbers < low
+        if high is not None:
+            invalid |= numbers > high
+        issues.append(_issues(table, frame, invalid, "domain", column, "not a number in range"))
+
+    for column in frame.columns.intersection(DATE_COLUMNS):
+        values = frame[column]
+        invalid = values.notna() & pd.to_datetime(values, format="%Y-%m-%d", errors="coerce").isna()
+        if invalid.any():
+            text = _text(values.where(invalid))
+            # Dates with a time part (e.g. from a spreadsheet) only lose the time
+            day = text.where(invalid).str[:10]
+            fixable = invalid & text.str.match(r"\d{4}-\d{2}-\d{2}[ T]", na=False) & pd.to_datetime(day, format="%Y-%m-%d", errors="coerce").notna()
+            issues.append(_issues(table, frame, fixable, "domain", column, "date stored with a time", "set to " + day.astype(str)))
+            issues.append(_issues(table, frame, invalid & ~fixable, "domain", column, "not a YYYY-MM-DD date"))
+            if fixable.any():
+                fix(column, day[fixable])
+    return issues, fixes
+
+
+# `radiotherapy` is each patient's current radiotherapy date, by MRN
+def _date_order(table, frame, radiotherapy=None):
+    issues = []
+    # Superseded patient rows were corrected by a later save
+    current = ~frame[KEY].duplicated(keep="last") if table == "patients" else pd.Series(True, index=frame.index)
+    for earlier, later in DATE_ORDER:
+        if earlier in frame and later in frame:
+            mask = current & (_dates(frame, later) < _dates(frame, earlier))
+            issues.append(_issues(table, frame, mask, "dates", later, f"before {earlier}", values=_text(frame[later]) + " < " + _text(frame[earlier])))
+    if VISIT_DATE in frame and radiotherapy is not None:
+        # Rows saved before the registry was split carry their own radiotherapy date
+        started = frame[KEY].map(radiotherapy)
+        if RADIOTHERAPY in frame:
+            started = started.where(started.notna(), _dates(frame, RADIOTHERAPY))
+        mask = _dates(frame, VISIT_DATE) < started
+        issues.append(_issues(table, frame, mask, "dates", VISIT_DATE, f"before {RADIOTHERAPY}", values=_text(frame[VISIT_DATE]) + " < " + started.dt.strftime("%Y-%m-%d")))
+    return issues
+
+
+# Returns the issues and the rows repair() drops (exact copies of an earlier row)
+def _duplicates(table, frame):
+    if table != "visits":
+        return [], np.zeros(len(frame), dtype=bool)
+    copies = frame.duplicated(keep="first").to_numpy()
+    issues = [_issues(table, frame, copies, "duplicates", VISIT_DATE, "exact copy of an earlier visit", "drop row")]
+    if VISIT_DATE in frame:
+        dated = frame[~copies & frame[VISIT_DATE].notna().to_numpy()]
+        same_day = dated.index[dated.duplicated([KEY, VISIT_DATE], keep=False)]
+        issues.append(_issues(table, frame, frame.index.isin(same_day), "duplicates", VISIT_DATE, "another visit of this patient has the same follow-up date"))
+    return issues, copies
+
+
+# All of a stored table's issues
+def _inspect(table, raw, radiotherapy=None):
+    raw = _by_position(raw)
+    frame = canonical_frame(raw)
+    issues = _schema(table, raw)
+    issues += _domain(table, frame)[0]
+    issues += _date_order(table, frame, radiotherapy)
+    issues += _duplicates(table, frame)[0]
+    return issues
+
+
+# Check the whole registry; returns a frame of ISSUE_COLUMNS
+def check():
+    with metrics.span("quality_check") as fields:
+        tables = {table: store.get_backend(table).load() for table in store.TABLES}
+        patients = canonical_frame(tables["patients"])
+        radiotherapy = None
+        if RADIOTHERAPY in patients:
+            current = patients.drop_duplicates(KEY, keep="last")
+            radiotherapy = pd.Series(_dates(current, RADIOTHERAPY).to_numpy(), index=current[KEY])
+        issues = []
+        for table, raw in tables.items():
+            issues += _inspect(table, raw, radiotherapy)
+        issues = [frame for frame in issues if not frame.empty]
+        issues = pd.concat(issues, ignore_index=True) if issues else pd.DataFrame(columns=ISSUE_COLUMNS)
+        fields["rows"] = sum(len(raw) for raw in tables.values())
+        fields["issues"] = len(issues)
+        return issues
+
+
+# Issue counts per table, check, column and message, and how many repair() fixes
+def summary(issues):
+    grouped = issues.assign(repairable=issues["repair"] != "").groupby(["table", "check", "column", "message"], sort=False)
+    return grouped.agg(rows=(KEY, "size"), repairable=("repairable", "sum")).reset_index()
+
+
+# Apply what repair() fixes to a stored table. Returns the repaired frame (None
+# if nothing changed) and the changed values as audit changes.
+def _repaired(table, raw):
+    raw = _by_position(raw)
+    frame = canonical_frame(raw)
+    fixes = _domain(table, frame)[1]
+    drop = _duplicates(table, frame)[1]
+    if frame is raw and not fixes and not drop.any():
+        return None, []
+    if fixes:
+        frame = frame.copy()
+    changes = []
+    for column, values in fixes.items():
+        stored = frame[column].to_numpy(dtype=object).copy()
+        changes += [(frame[KEY].iat[row], column, str(stored[row]), value) for row, value in values.items() if not drop[row]]
+        stored[values.index] = values.to_numpy()
+        frame[column] = stored
+    return frame[~drop].reset_index(drop=True), changes
+
+
+# Repair what can be repaired without review, rewriting the stored tables
+# (saves wait meanwhile). Changed values are logged in registry.audit under
+# `user`. Returns the number of rows rewritten per table.
+def repair(user=None):
+    rewritten, changes = {}, []
+
+    def fix(table):
+        def rewrite(raw):
+            frame, table_changes = _repaired(table, raw)
+            if frame is not None:
+                rewritten[table] = len(frame)
+                changes.extend(table_changes)
+            return frame
+        return rewrite
+
+    with metrics.span("quality_repair") as fields:
+        for table in store.TABLES:
+            store.get_backend(table).rewrite(fix(table))
+        fields["changes"] = len(changes)
+    audit.record(changes, user=user)
+    return rewritten
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the registry for data-quality issues")
+    parser.add_argument("--report", default="quality.csv", help="where to write one line per issue")
+    parser.add_argument("--repair", action="store_true", help="repair what needs no review, then check again")
+    args = parser.parse_args()
+
+    issues = check()
+    if args.repair:
+        rewritten = repair()
+        print(f"Repaired and rewrote: {', '.join(f'{table} ({rows} rows)' for table, rows in rewritten.items()) or 'nothing to repair'}")
+        issues = check()
+    issues.to_csv(args.report, index=False)
+    if issues.empty:
+        print("No issues found")
+    else:
+        print(summary(issues).to_string(index=False))
+    print(f"Report: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import pandas as pd
+
+# Registry columns, in the order they are stored and exported
+COLUMNS = [
+    "MRN", "Date_of_Birth", "Age", "Date_of_Last_Radiotherapy", "Follow_up_date", "Follow_up_time",
+    "Histology", "ISUP", "Perineural_Invasion", "LVI", "High_Grade_PIN", "Clinical Stage", "Biopsy_date", "IPSS", "iPSA",
+    "Androgen_Deprivation_Therapy", "ADT_type", "ADT_first_date", "ADT_last_date",
+    "Use_of_ARATs_or_CYP17A1_inhibitor", "ARATs_first_date", "ARATs_last_date",
+    "Chemotherapy", "Chemotherapy_first_date", "Chemotherapy_last_date",
+    "Radioligant_Therapy", "Radioligant_Therapy_first_date", "Radioligant_Therapy_last_date",
+    "Dose", "Volume",
+    "Fatigue", "Dysuria", "Cystitis", "Bladder_Perforation", "Bladder_Spasms", "Hematuria", "Urinary_Fistula", "Urinary_Frequency", "Urinary_Incontinence", "Urinary_Retention", "Urinary_Obstruction", "Urinary_Urgency",
+    "Diarrhea", "Nausea", "Proctitis", "Rectal_Fistula", "Rectal_Hemorrhage", "Rectal_Pain", "Rectal_perforation", "Rectal_Stenosis",
+    "Erectile_Dysfunction", "Gynecomastia", "Ejaculation_Disorder", "Testosterone_deficiency", "Overal_tolerance",
+    "biochemical_recurrence", "local_recurrence", "regional_recurrence", "distant_recurrence", "death", "Cancer_related_death",
+    "biochemical_recurrence_date", "local_recurrence_date", "regional_recurrence_date", "distant_recurrence_date", "death_date",
+    "time_to_biochemical_recurrence", "time_to_local_recurrence", "time_to_regional_recurrence", "time_to_distant_recurrence", "time_to_death"
+]
+
+# Patients are looked up by MRN; every backend indexes this column
+KEY = "MRN"
+
+# Fields describing the patient, their tumour and treatment. These are stored
+# once per patient (and again only when they change), not on every visit.
+PATIENT_COLUMNS = [
+    "MRN", "Date_of_Birth", "Date_of_Last_Radiotherapy",
+    "Histology", "ISUP", "Perineural_Invasion", "LVI", "High_Grade_PIN", "Clinical Stage", "Biopsy_date", "iPSA",
+    "Androgen_Deprivation_Therapy", "ADT_type", "ADT_first_date", "ADT_last_date",
+    "Use_of_ARATs_or_CYP17A1_inhibitor", "ARATs_first_date", "ARATs_last_date",
+    "Chemotherapy", "Chemotherapy_first_date", "Chemotherapy_last_date",
+    "Radioligant_Therapy", "Radioligant_Therapy_first_date", "Radioligant_Therapy_last_date",
+    "Dose", "Volume",
+]
+
+# Fields recorded at each follow-up: toxicity, recurrence and the values derived from the visit date
+VISIT_COLUMNS = [KEY] + [column for column in COLUMNS if column not in PATIENT_COLUMNS]
+
+
+# Keys the form has saved under names that differ from the schema
+LEGACY_KEYS = {
+    "Clinical_Stage": "Clinical Stage",
+    "Biochemical_recurrence": "biochemical_recurrence",
+    "Local_recurrence": "local_recurrence",
+    "Regional_recurrence": "regional_recurrence",
+    "Distant_recurrence": "distant_recurrence",
+    "Death": "death",
+    "Cancer Related Death": "Cancer_related_death",
+    "Time_to_biochemical_recurrence": "time_to_biochemical_recurrence",
+    "Time_to_local_recurrence": "time_to_local_recurrence",
+    "Time_to_regional_recurrence": "time_to_regional_recurrence",
+    "Time_to_distant_recurrence": "time_to_distant_recurrence",
+}
+
+
+# Rename legacy keys in a record to their schema column. As in
+# canonical_frame(), a value under the schema column wins unless it is missing.
+def canonical_record(data):
+    record = {key: value for key, value in data.items() if key not in LEGACY_KEYS}
+    for legacy, column in LEGACY_KEYS.items():
+        if legacy in data and _missing(record.get(column)):
+            record[column] = data[legacy]
+    return record
+
+
+def _missing(value):
+    return value is None or (not isinstance(value, (list, tuple)) and pd.isna(value))
+
+
+# Fold legacy columns of a stored frame into their schema column
+def canonical_frame(frame):
+    legacy = [column for column in LEGACY_KEYS if column in frame]
+    if not legacy:
+        return frame
+    frame = frame.copy()
+    for column in legacy:
+        target = LEGACY_KEYS[column]
+        if target in frame:
+            frame[target] = frame[target].where(frame[target].notna(), frame[column])
+        else:
+            frame[target] = frame[column]
+    return frame.drop(columns=legacy)
+
+
+def empty_frame(columns=COLUMNS):
+    return pd.DataFrame(columns=columns)
+
+
+# MRNs are compared as stripped strings everywhere
+def normalise_mrn(values):
+    return values.astype(str).str.strip()
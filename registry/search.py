@@ -0,0 +1,154 @@
+# Filtered, sorted and paginated queries over the registry.
+#
+# Queries run against the process-wide load_data() frame, so sessions share
+# one copy of the registry. RegistryIndex adds the secondary indexes the
+# filters need: follow-up dates and MRNs sorted once for range and prefix
+# lookups by binary search, value filters on the Categorical codes of the
+# typed frame (see registry.encoding), and a sort order per column computed
+# on first use.
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from registry import encoding, metrics, store
+from registry.index import VISIT_DATE
+from registry.options import DATE_COLUMNS, MULTI_CHOICE, NUMERIC_RANGES, TOXICITY_FIELDS
+from registry.schema import KEY
+
+PAGE_SIZE = 50
+
+
+class RegistryIndex:
+    def __init__(self, frame):
+        self.frame = frame
+        dates = pd.to_datetime(frame[VISIT_DATE], errors="coerce").to_numpy(dtype="datetime64[ns]")
+        # NaT sorts last, so a date range never matches a missing date
+        self._date_order = np.argsort(dates, kind="stable")
+        self._dates = dates[self._date_order]
+        mrns = frame[KEY].astype(str).to_numpy(dtype=object)
+        self._mrn_order = np.argsort(mrns, kind="stable")
+        self._mrns = mrns[self._mrn_order]
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    # Rows whose follow-up date is within [since, until]
+    def between(self, since=None, until=None):
+        low = 0 if since is None else np.searchsorted(self._dates, np.datetime64(pd.Timestamp(since), "ns"), side="left")
+        if until is None:
+            high = len(self._dates) - np.isnat(self._dates).sum()
+        else:
+            high = np.searchsorted(self._dates, np.datetime64(pd.Timestamp(until), "ns"), side="right")
+        mask = np.zeros(len(self.frame), dtype=bool)
+        mask[self._date_order[low:high]] = True
+        return mask
+
+    # Rows whose MRN starts with `prefix`
+    def mrn_prefix(self, prefix):
+        low = np.searchsorted(self._mrns, prefix, side="left")
+        high = np.searchsorted(self._mrns, prefix + "\uffff", side="right")
+        mask = np.zeros(len(self.frame), dtype=bool)
+        mask[self._mrn_order[low:high]] = True
+        return mask
+
+    # Rows whose value in `column` is one of `values` (for a multiselect, any selected item is)
+    def isin(self, column, values):
+        series = self.frame[column]
+        if column in MULTI_CHOICE:
+            return encoding.has_any(self.frame, column, values)
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            wanted = series.cat.categories.get_indexer([str(value) for value in values])
+            return np.isin(series.cat.codes.to_numpy(), wanted[wanted >= 0])
+        return series.astype(str).isin([str(value) for value in values]).to_numpy()
+
+    # Rows with a CTCAE grade of at least `grade` for `column`, or for any side effect if column is None
+    def graded(self, grade, column=None):
+        columns = [column] if column else [field for field in TOXICITY_FIELDS if field in self.frame]
+        mask = np.zeros(len(self.frame), dtype=bool)
+        for field in columns:
+            mask |= encoding.grade_at_least(self.frame, field, grade)
+        return mask
+
+    # The values `column` is sorted by. Stored columns may mix types (e.g.
+    # PSA saved as 4.1 and "4.1"), which can't be compared: numbers and dates
+    # are parsed, values that don't parse count as missing, and any other
+    # column is compared as text.
+    def _sort_key(self, column):
+        values = self.frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy().astype(float)
+            codes[codes < 0] = np.nan
+            return pd.Series(codes)
+        if column.endswith("_date") or column in DATE_COLUMNS:
+            return pd.to_datetime(values, errors="coerce")
+        if column in NUMERIC_RANGES:
+            return pd.to_numeric(values, errors="coerce")
+        if values.dtype == object:
+            return values.astype(str).where(values.notna())
+        return values
+
+    # Row positions sorted by `column` (missing values last) and whether each
+    # of them is missing, cached per column
+    def order(self, column):
+        with self._lock:
+            if column not in self._orders:
+                key = self._sort_key(column)
+                order = np.argsort(key.rank(method="first", na_option="bottom").to_numpy(), kind="stable")
+                self._orders[column] = order, key.isna().to_numpy()[order]
+            return self._orders[column]
+
+    # Positions of the matching rows in sort order. Filters: since/until
+    # (follow-up date), where {column: allowed values}, grades {column:
+    # minimum grade}, any_grade (minimum grade of any side effect) and mrn (prefix).
+    def matches(self, **filters):
+        with metrics.span("search") as fields:
+            matches = self._matches(**filters)
+            fields["rows"] = len(matches)
+        return matches
+
+    def _matches(self, since=None, until=None, where=None, grades=None, any_grade=None, mrn=None,
+                 sort_by=VISIT_DATE, descending=False):
+        mask = np.ones(len(self.frame), dtype=bool)
+        if since is not None or until is not None:
+            mask &= self.between(since, until)
+        for column, values in (where or {}).items():
+            mask &= self.isin(column, values)
+        for column, grade in (grades or {}).items():
+            mask &= self.graded(grade, column)
+        if any_grade is not None:
+            mask &= self.graded(any_grade)
+        if mrn:
+            mask &= self.mrn_prefix(str(mrn).strip())
+
+        order, missing = self.order(sort_by)
+        if descending:
+            # Reverse the ordering but keep missing values last
+            order = np.concatenate([order[~missing][::-1], order[missing]])
+        return order[mask[order]]
+
+    # Rows of one page of matches (pages count from 0), decoded for display
+    def page(self, matches, page=0, page_size=PAGE_SIZE):
+        start = page * page_size
+        return encoding.decode(self.frame.iloc[matches[start:start + page_size]])
+
+    # One page of matching rows, plus the number of matches
+    def query(self, page=0, page_size=PAGE_SIZE, **filters):
+        matches = self.matches(**filters)
+        return self.page(matches, page, page_size), len(matches)
+
+
+_memo_lock = threading.Lock()
+_memo = {"frame": None, "index": None}
+
+
+# The index over the stored registry, rebuilt when the registry changes
+def registry_index():
+    frame = store.load_data()
+    with _memo_lock:
+        if _memo["frame"] is not frame:
+            _memo.update(frame=frame, index=RegistryIndex(frame))
+        return _memo["index"]
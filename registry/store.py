@@ -0,0 +1,315 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from registry import audit, encoding, metrics, writer
+from registry.backends import open_backend
+from registry.derived import derive
+from registry.index import visit_sort_keys
+from registry.options import MULTI_CHOICE
+from registry.schema import COLUMNS, KEY, PATIENT_COLUMNS, VISIT_COLUMNS, canonical_frame, canonical_record
+
+# Storage backend ("sqlite", "parquet" or "excel") and the file it keeps the
+# registry in. With sqlite or parquet the workbook is only an export, see
+# export_excel().
+storage_backend = "sqlite"
+storage_path = "registry.db"
+
+# The registry is two tables: one row per follow-up visit, and one row per
+# change to a patient's static details (the latest row is the current state)
+TABLES = {"visits": VISIT_COLUMNS, "patients": PATIENT_COLUMNS}
+
+# One backend per table and process, shared by every Streamlit session so their caches are too
+_backend_lock = threading.Lock()
+_backends = {}
+_settings = None
+_joined = {"source": None, "visits": 0, "patients": 0, "frame": None}
+
+
+# The file holding a table: SQLite keeps both tables in one database, the
+# file-based backends keep patients next to the visits file
+def _table_path(table):
+    if storage_backend == "sqlite" or table == "visits":
+        return storage_path
+    root, ext = os.path.splitext(storage_path)
+    return f"{root}.{table}{ext}"
+
+
+# The backend for a table under the current settings, reopened if they have changed
+def get_backend(table="visits"):
+    global _settings
+    with _backend_lock:
+        if _settings != (storage_backend, storage_path):
+            _close_backends()
+            for name, columns in TABLES.items():
+                _backends[name] = open_backend(storage_backend, _table_path(name), name, columns)
+            _settings = (storage_backend, storage_path)
+        return _backends[table]
+
+
+def _close_backends():
+    global _settings
+    for backend in _backends.values():
+        backend.close()
+    _backends.clear()
+    _joined.update(source=None, visits=0, patients=0, frame=None)
+    _settings = None
+
+
+# Close the open backends, e.g. before the registry files are removed; the next call reopens them
+def close():
+    with _backend_lock:
+        _close_backends()
+
+
+# Current static details for every patient: the last saved row per MRN
+def load_patients():
+    return get_backend("patients").load().drop_duplicates(KEY, keep="last")
+
+
+# Load existing data or create a new DataFrame: one row per visit, with the
+# patient's current static details alongside and the derived fields
+# recomputed from the stored dates. Radio and multiselect fields are typed
+# (see registry.encoding): Categoricals and option bitmasks rather than strings.
+# The frame is shared between sessions: callers must not modify it in place.
+#
+# Both tables are append-only, so after a save only the new visits are joined,
+# derived and encoded, plus the visits of patients whose details changed; the
+# rest of the cached frame is reused. Everything is joined again when a
+# backend rebuilds its frame (see its `generation`).
+def load_data():
+    with metrics.span("load_data") as fields:
+        backends = [get_backend("visits"), get_backend("patients")]
+        visits, patients = (backend.load() for backend in backends)
+        source = [(id(backend), backend.generation) for backend in backends]
+        with _backend_lock:
+            cached = _joined["frame"]
+            fields["cached"] = _joined["source"] == source and (_joined["visits"], _joined["patients"]) == (len(visits), len(patients))
+            if not fields["cached"]:
+                frame = None
+                if _joined["source"] == source and _joined["visits"] <= len(visits) and _joined["patients"] <= len(patients):
+                    frame = _extend_join(cached, visits, patients, _joined["visits"], _joined["patients"])
+                fields["incremental"] = frame is not None
+                if frame is None:
+                    frame = _join(visits, patients.drop_duplicates(KEY, keep="last"))
+                _joined.update(source=source, visits=len(visits), patients=len(patients), frame=frame)
+            fields["rows"] = len(_joined["frame"])
+            return _joined["frame"]
+
+
+# The joined frame for visits[:visit_count] and patients[:patient_count],
+# brought up to date with the rows appended since. Returns None when the
+# pieces can't be combined and everything has to be joined again.
+def _extend_join(frame, visits, patients, visit_count, patient_count):
+    changed = patients[KEY].iloc[patient_count:].unique()
+    # Patients whose details changed have their earlier visits joined again too
+    stale = np.flatnonzero(visits[KEY].iloc[:visit_count].isin(changed))
+    positions = np.concatenate([stale, np.arange(visit_count, len(visits))])
+    rows = visits.iloc[positions]
+    joined = _join(rows, _latest_details(patients, rows[KEY].unique()))
+    frame = _combine([frame, joined])
+    if frame is None:
+        return None
+    # One take puts the rejoined rows in place of the stale ones
+    order = np.concatenate([np.arange(visit_count), np.arange(visit_count + len(stale), len(frame))])
+    order[stale] = np.arange(visit_count, visit_count + len(stale))
+    if len(stale):
+        frame = frame.iloc[order]
+        frame.index = pd.RangeIndex(len(frame))
+    return frame
+
+
+# The current details of the given patients
+def _latest_details(patients, mrns):
+    return patients[patients[KEY].isin(mrns)].drop_duplicates(KEY, keep="last")
+
+
+# Concatenate joined frames, keeping their encoded types: Categoricals get
+# the union of their categories, and all-missing columns take the type the
+# column has elsewhere. None if the frames have different columns, or a
+# multiselect column is a bitmask in one and left as text in another.
+def _combine(pieces):
+    pieces = [piece for piece in pieces if len(piece)]
+    if len(pieces) == 1:
+        return pieces[0]
+    columns = list(pieces[0].columns)
+    if any(list(piece.columns) != columns for piece in pieces):
+        return None
+    # Shallow copies: the cached frame is shared and must not change
+    pieces = [piece.copy(deep=False) for piece in pieces]
+    for column in columns:
+        dtype = pieces[0][column].dtype
+        if all(piece[column].dtype == dtype for piece in pieces):
+            continue
+        if column in MULTI_CHOICE and len({encoding.is_encoded_multiselect(piece[column]) for piece in pieces}) > 1:
+            return None
+        if isinstance(dtype, pd.CategoricalDtype):
+            if not all(isinstance(piece[column].dtype, pd.CategoricalDtype) for piece in pieces):
+                return None
+            first = list(dtype.categories)
+            extra = sorted({category for piece in pieces[1:] for category in piece[column].cat.categories} - set(first))
+            for piece in pieces:
+                piece[column] = piece[column].cat.set_categories(first + extra)
+            continue
+        for piece in pieces[1:]:
+            if piece[column].isna().all():
+                piece[column] = piece[column].astype(object if dtype == bool else dtype)
+    return pd.concat(pieces, ignore_index=True)
+
+
+def _join(visits, patients):
+    visits, patients = canonical_frame(visits), canonical_frame(patients)
+    static = [column for column in patients.columns if column != KEY]
+    wide = visits.drop(columns=static, errors="ignore").merge(patients, on=KEY, how="left")
+    # Rows saved before the registry was split carry their own static details;
+    # keep them for patients with no patient record
+    for column in static:
+        if column in visits:
+            wide[column] = wide[column].where(wide[column].notna(), visits[column].to_numpy())
+    leading = [column for column in COLUMNS if column in wide]
+    return encoding.encode(derive(wide[leading + [column for column in wide.columns if column not in leading]]))
+
+
+# Forget cached data so the next load_data() re-reads storage
+def invalidate_cache():
+    for table in TABLES:
+        get_backend(table).invalidate()
+
+
+# Excel stores multiselect values as their string form; store every backend's rows the same way
+def _to_cells(data):
+    return {key: str(value) if isinstance(value, (list, tuple)) else value for key, value in data.items()}
+
+
+# Split a form record into its static patient details and the visit itself
+def split_record(data):
+    patient = {key: value for key, value in data.items() if key in PATIENT_COLUMNS}
+    visit = {key: value for key, value in data.items() if key not in PATIENT_COLUMNS or key == KEY}
+    return patient, visit
+
+
+# A patient's current static details, or None for a new patient
+def get_patient(mrn):
+    rows = get_backend("patients").lookup(str(mrn).strip())
+    if rows.empty:
+        return None
+    return canonical_record(rows.iloc[-1].to_dict())
+
+
+# All of a patient's visits, oldest follow-up first
+def get_patient_visits(mrn):
+    return get_backend("visits").lookup(str(mrn).strip())
+
+
+# Function to fetch existing patient data by MRN: the patient's current
+# static details together with their latest visit, for prefilling the form.
+# Legacy keys are folded into their schema column (see schema.canonical_record).
+def get_patient_data(mrn):
+    with metrics.span("lookup") as fields:
+        patient = get_patient(mrn)
+        visits = get_patient_visits(mrn)
+        fields["rows"] = len(visits)
+    if patient is None and visits.empty:
+        return None
+    data = canonical_record(visits.iloc[-1].to_dict()) if not visits.empty else {}
+    for key, value in (patient or {}).items():
+        if pd.notna(value) or key not in data:
+            data[key] = value
+    return data
+
+
+# Function to save patient data (Appending Instead of Overwriting).
+# Every save adds a visit; the static details are only stored again when they
+# differ from the patient's current state. Saves from concurrent sessions are
+# batched by the writer thread; this returns once the record is durable.
+# The fields that changed are logged in registry.audit under `user`.
+def save_data(data, user=None):
+    data[KEY] = str(data[KEY]).strip()
+    save_records([data], user=user)
+
+
+# Save many records at once (e.g. a bulk import), as one batch per table.
+# audited=False skips the change log, e.g. for loading historical data.
+def save_records(records, user=None, audited=True):
+    with metrics.span("save", rows=len(records)) as fields:
+        changes = _save_records(records, audited)
+        fields["changes"] = len(changes)
+    audit.record(changes, user=user)
+
+
+def _save_records(records, audited=True):
+    patients, visits = [], []
+    latest, previous = {}, {}
+    changes = []
+    # One query per MRN is cheapest for a single save; for a batch, read all current details at once
+    current_details = current_visits = None
+    if len(records) > 1:
+        current_details = load_patients().set_index(KEY, drop=False)
+        if audited:
+            current_visits = _latest_visits()
+    for data in records:
+        patient, visit = split_record(_to_cells(canonical_record(data)))
+        mrn = patient[KEY] = visit[KEY] = str(data[KEY]).strip()
+        if mrn not in latest:
+            if current_details is None:
+                latest[mrn] = get_patient(mrn)
+            else:
+                latest[mrn] = current_details.loc[mrn].to_dict() if mrn in current_details.index else None
+        current = latest[mrn]
+        if current is None or any(_differs(current.get(key), value) for key, value in patient.items()):
+            patients.append(patient)
+            latest[mrn] = patient
+            if audited:
+                changes.extend((mrn, field, old, new) for field, old, new in audit.diff(current, patient, _differs))
+        visits.append(visit)
+
+        if audited:
+            # The visit is compared with the patient's previous one, so the log shows what changed since
+            if mrn not in previous:
+                if current_visits is None:
+                    rows = canonical_frame(get_patient_visits(mrn))
+                    previous[mrn] = rows.iloc[-1].to_dict() if not rows.empty else None
+                else:
+                    previous[mrn] = current_visits.get(mrn)
+            changes.extend((mrn, field, old, new) for field, old, new in audit.diff(previous[mrn], visit, _differs))
+            previous[mrn] = visit
+
+    pending = []
+    if patients:
+        pending.append(writer.submit(get_backend("patients"), patients))
+    if visits:
+        pending.append(writer.submit(get_backend("visits"), visits))
+    for future in pending:
+        future.result()
+    return changes
+
+
+# Each patient's latest visit (by follow-up date, then save order) as a dict per MRN
+def _latest_visits():
+    frame = canonical_frame(get_backend("visits").load())
+    if frame.empty:
+        return {}
+    order = np.lexsort((np.arange(len(frame)), visit_sort_keys(frame)))
+    frame = frame.iloc[order].drop_duplicates(KEY, keep="last")
+    frame = frame.astype(object).where(frame.notna(), None)
+    return {row[KEY]: row for row in frame.to_dict("records")}
+
+
+# Stored values may come back as another type (e.g. 5 vs 5.0 vs "5")
+def _differs(stored, value):
+    if pd.isna(stored) and pd.isna(value):
+        return False
+    try:
+        return float(stored) != float(value)
+    except (TypeError, ValueError):
+        return str(stored) != str(value)
+
+
+# Write the whole registry to an Excel workbook. The file is written next to
+# `path` and swapped in, so a reader never sees a half-written workbook.
+# registry.export does the writing (and offers CSV, Parquet and filters).
+def export_excel(path):
+    from registry import export  # registry.export imports this module
+    export.write_snapshot(path)
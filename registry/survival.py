@@ -0,0 +1,151 @@
+# Kaplan-Meier estimates for the recurrence and death endpoints.
+#
+# Each patient contributes one observation per endpoint: the earliest
+# time_to_* among visits where the event was recorded, or, if it never was,
+# censoring at their longest Follow_up_time. Everything is computed with
+# vectorised group-bys and numpy, so 100k patients take well under a second.
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from registry import encoding, store
+from registry.options import MULTI_CHOICE
+from registry.schema import KEY
+
+# Endpoint -> (event flag column, months-to-event column)
+ENDPOINTS = {
+    "Biochemical recurrence": ("biochemical_recurrence", "time_to_biochemical_recurrence"),
+    "Local recurrence": ("local_recurrence", "time_to_local_recurrence"),
+    "Regional recurrence": ("regional_recurrence", "time_to_regional_recurrence"),
+    "Distant recurrence": ("distant_recurrence", "time_to_distant_recurrence"),
+    "Death": ("death", "time_to_death"),
+}
+
+# Stratification choices -> patient column
+STRATA = {"None": None, "ISUP": "ISUP", "ADT": "Androgen_Deprivation_Therapy", "Dose": "Dose"}
+
+# z for a 95% confidence interval
+Z = 1.959964
+
+# One row per patient: MRN, the earliest time to the event where it was
+# recorded with one, whether it was recorded at all, and the longest follow-up
+def _observations(frame, endpoint):
+    flag, time_column = ENDPOINTS[endpoint]
+    times = pd.to_numeric(frame[time_column], errors="coerce") if time_column in frame else pd.Series(np.nan, index=frame.index)
+    follow_up = pd.to_numeric(frame["Follow_up_time"], errors="coerce") if "Follow_up_time" in frame else times * np.nan
+    occurred = frame[flag].eq("Yes") if flag in frame else pd.Series(False, index=frame.index)
+
+    grouped = pd.DataFrame({
+        KEY: frame[KEY],
+        "event_time": times.where(occurred),
+        "recorded": occurred,
+        "follow_up": follow_up,
+    }).groupby(KEY, sort=False)
+    return grouped.agg(event_time=("event_time", "min"), recorded=("recorded", "any"), follow_up=("follow_up", "max"))
+
+
+# Patients whose event is recorded without a usable time to it (e.g. "N/A"
+# from the old form, or a bulk import without the date). They are left out of
+# the curves: censoring them would drop a real event.
+def undated_events(frame, endpoint):
+    data = _observations(frame, endpoint)
+    return data.index[data["recorded"] & data["event_time"].isna()]
+
+
+# One row per patient: MRN, time (months) and event (True = event, False = censored)
+def survival_data(frame, endpoint):
+    data = _observations(frame, endpoint)
+    data = data[~(data["recorded"] & data["event_time"].isna())].copy()
+    data["event"] = data["event_time"].notna()
+    data["time"] = data["event_time"].where(data["event"], data["follow_up"])
+    data = data[data["time"].notna() & (data["time"] >= 0)]
+    return data[["time", "event"]]
+
+
+# Kaplan-Meier survival with Greenwood log-log 95% confidence bounds.
+# Returns one row per distinct time, starting from time 0: (0, 1.0) unless
+# there are events or censorings at time 0, in which case that row is S(0).
+def kaplan_meier(times, events):
+    times = np.asarray(times, dtype=float)
+    events = np.asarray(events, dtype=bool)
+    unique, inverse = np.unique(times, return_inverse=True)
+    removed = np.bincount(inverse, minlength=len(unique))
+    died = np.bincount(inverse, weights=events, minlength=len(unique))
+    at_risk = len(times) - np.concatenate(([0], np.cumsum(removed)[:-1]))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        survival = np.cumprod(1 - died / at_risk)
+        greenwood = np.cumsum(died / (at_risk * (at_risk - died)))
+        log_survival = np.log(survival)
+        half_width = Z * np.sqrt(greenwood) / np.abs(log_survival)
+        lower = np.exp(-np.exp(np.log(-log_survival) + half_width))
+        upper = np.exp(-np.exp(np.log(-log_survival) - half_width))
+    # No events yet (or all of them): the interval collapses onto the estimate
+    undefined = ~np.isfinite(half_width)
+    lower[undefined] = survival[undefined]
+    upper[undefined] = survival[undefined]
+
+    curve = pd.DataFrame({
+        "time": unique, "at_risk": at_risk, "events": died.astype(int), "censored": (removed - died).astype(int),
+        "survival": survival, "lower": lower, "upper": upper,
+    })
+    if len(curve) and curve["time"].iloc[0] == 0:
+        return curve
+    start = pd.DataFrame({"time": [0.0], "at_risk": [len(times)], "events": [0], "censored": [0], "survival": [1.0], "lower": [1.0], "upper": [1.0]})
+    return pd.concat([start, curve] if len(curve) else [start], ignore_index=True)
+
+
+# Stratum labels per patient; a multiselect like Dose can put a patient in several strata
+def _strata(frame, by):
+    column = STRATA[by]
+    latest = frame.drop_duplicates(KEY, keep="last").set_index(KEY)
+    if column is None:
+        return pd.Series("All patients", index=latest.index)
+    values = latest[column] if column in latest else pd.Series(np.nan, index=latest.index)
+    if column in MULTI_CHOICE:
+        items = encoding.explode(values.to_frame(column), column)
+        if by == "ADT":
+            # Any agent other than "None" counts as ADT use
+            used = (items != "None").groupby(level=0).any().reindex(latest.index, fill_value=False)
+            return used.map({True: "ADT", False: "No ADT"})
+        return items
+    return values.astype(object).fillna("Not recorded").astype(str)
+
+
+# KM curve per stratum for one endpoint: {stratum: curve}
+def survival_curves(frame, endpoint, by="None"):
+    data = survival_data(frame, endpoint)
+    strata = _strata(frame, by)
+    joined = data.join(strata.rename("stratum"), how="inner")
+    return {
+        stratum: kaplan_meier(group["time"], group["event"])
+        for stratum, group in joined.groupby("stratum", sort=True)
+    }
+
+
+_memo_lock = threading.Lock()
+_memo = {"frame": None, "curves": {}, "undated": {}}
+
+
+# survival_curves() over the stored registry, memoised until the registry changes
+def registry_curves(endpoint, by="None"):
+    frame = store.load_data()
+    with _memo_lock:
+        if _memo["frame"] is not frame:
+            _memo.update(frame=frame, curves={}, undated={})
+        if (endpoint, by) not in _memo["curves"]:
+            _memo["curves"][(endpoint, by)] = survival_curves(frame, endpoint, by)
+        return _memo["curves"][(endpoint, by)]
+
+
+# undated_events() over the stored registry, memoised like registry_curves()
+def registry_undated_events(endpoint):
+    frame = store.load_data()
+    with _memo_lock:
+        if _memo["frame"] is not frame:
+            _memo.update(frame=frame, curves={}, undated={})
+        if endpoint not in _memo["undated"]:
+            _memo["undated"][endpoint] = undated_events(frame, endpoint)
+        return _memo["undated"][endpoint]
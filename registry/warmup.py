@@ -0,0 +1,104 @@
+# Warms the registry in a background thread when the app starts, so the first
+# clinician to connect gets the form at once and their first MRN lookup
+# doesn't wait for the registry to be read: the data layer's imports, the
+# joined registry with each table's MRN index, the search index and the
+# cohort aggregates. status() and ready() report how far it has got.
+#
+# Only the standard library is imported here; everything heavy is imported by
+# the warm-up thread itself.
+
+import logging
+import os
+import threading
+import time
+
+from registry import metrics
+
+logger = logging.getLogger("registry.warmup")
+
+# Set REGISTRY_WARMUP=0 to skip warming: everything is then loaded on first use
+enabled = os.environ.get("REGISTRY_WARMUP", "1") != "0"
+
+_lock = threading.Lock()
+_thread = None
+_status = {}
+
+
+def _imports():
+    from registry import aggregates, search, store  # noqa: F401
+
+
+def _registry():
+    from registry import store
+    store.load_data()
+
+
+# Journaled backends build their MRN index on load; a lookup also warms
+# SQLite's query path
+def _mrn_index():
+    from registry import store
+    for table in store.TABLES:
+        store.get_backend(table).lookup("")
+
+
+def _search_index():
+    from registry.search import registry_index
+    registry_index()
+
+
+def _aggregates():
+    from registry.aggregates import get_aggregates
+    get_aggregates()
+
+
+STEPS = [
+    ("imports", _imports),
+    ("registry", _registry),
+    ("MRN index", _mrn_index),
+    ("search index", _search_index),
+    ("cohort aggregates", _aggregates),
+]
+
+
+def _run():
+    for step, warm in STEPS:
+        _status[step] = {"state": "running", "seconds": None, "error": None}
+        began = time.perf_counter()
+        try:
+            with metrics.span("warmup", step=step):
+                warm()
+            _status[step].update(state="done")
+        except Exception as error:
+            # Not fatal: whatever failed is loaded (and fails visibly) on first use instead
+            logger.exception("Warming %s failed", step)
+            _status[step].update(state="failed", error=repr(error))
+        _status[step]["seconds"] = round(time.perf_counter() - began, 3)
+
+
+# Start warming, once per process; later calls do nothing
+def start():
+    global _thread
+    with _lock:
+        if _thread is not None or not enabled:
+            return
+        for step, _ in STEPS:
+            _status[step] = {"state": "pending", "seconds": None, "error": None}
+        _thread = threading.Thread(target=_run, name="registry-warmup", daemon=True)
+        _thread.start()
+
+
+# True once every step has finished, or if warming is off or not started
+def ready():
+    return _thread is None or not _thread.is_alive()
+
+
+# Wait for warming to finish; returns ready()
+def wait(timeout=None):
+    if _thread is not None:
+        _thread.join(timeout)
+    return ready()
+
+
+# One row per step: its state (pending, running, done or failed), seconds taken and error
+def status():
+    return [dict(step=step, **_status.get(step, {"state": "off", "seconds": None, "error": None})) for step, _ in STEPS]
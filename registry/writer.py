@@ -0,0 +1,55 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+# Single writer per process. Saves from every Streamlit session are queued and
+# a background thread drains whatever has accumulated, writing each table's
+# rows with one backend append (one fsync or one transaction) however many
+# sessions saved at the same time. Writers in other processes are kept out by
+# the backends' own locking.
+_queue = queue.Queue()
+_thread_lock = threading.Lock()
+_thread = None
+
+
+def _run():
+    while True:
+        batch = [_queue.get()]
+        while True:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        # Group by backend, keeping submission order within each
+        groups = {}
+        for backend, rows, future in batch:
+            group = groups.setdefault(id(backend), (backend, [], []))
+            group[1].extend(rows)
+            group[2].append(future)
+
+        for backend, rows, futures in groups.values():
+            try:
+                backend.append(rows)
+            except Exception as exc:
+                for future in futures:
+                    future.set_exception(exc)
+            else:
+                for future in futures:
+                    future.set_result(len(rows))
+
+
+def _ensure_thread():
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="registry-writer", daemon=True)
+            _thread.start()
+
+
+# Queue rows for a backend; the returned Future resolves once they are durable
+def submit(backend, rows):
+    future = Future()
+    _ensure_thread()
+    _queue.put((backend, rows, future))
+    return future
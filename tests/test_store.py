@@ -0,0 +1,40 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from registry import audit, encoding, form, store
+from registry.schema import KEY
+
+# A row as the app saved it before the registry was split: every field in one
+# table, some of them under legacy keys
+LEGACY_ROW = {
+    KEY: "1001", "Date_of_Birth": "1950-01-01", "Date_of_Last_Radiotherapy": "2022-01-01",
+    "Follow_up_date": "2023-01-01", "ISUP": "2", "Clinical_Stage": "['cT2a', 'cN0']", "Death": "No",
+}
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "storage_backend", "excel")
+    monkeypatch.setattr(store, "storage_path", str(tmp_path / "registry.xlsx"))
+    monkeypatch.setattr(audit, "path", str(tmp_path / "registry.audit.db"))
+    store.close()
+    yield tmp_path / "registry.xlsx"
+    store.close()
+
+
+def test_legacy_row_round_trips_through_the_form(registry):
+    pd.DataFrame([LEGACY_ROW]).to_excel(registry, index=False)
+
+    # The form is prefilled with the value stored under the legacy key...
+    values = form.prefill(store.get_patient_data("1001"))
+    assert values["Clinical Stage"] == ["cT2a", "cN0"]
+
+    # ...so the next follow-up keeps it, for the new visit and the earlier one
+    values[KEY] = "1001"
+    values["Follow_up_date"] = date(2024, 1, 1)
+    store.save_data(form.record(values))
+    stages = encoding.decode(store.load_data())["Clinical Stage"]
+    assert stages.tolist() == ["['cT2a', 'cN0']", "['cT2a', 'cN0']"]
+    assert store.get_patient("1001")["Clinical Stage"] == "['cT2a', 'cN0']"
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from registry.schema import KEY
+from registry.survival import kaplan_meier, survival_data, undated_events
+
+
+def test_events_at_time_zero_count():
+    curve = kaplan_meier([0, 0, 5, 10], [1, 0, 1, 0])
+    assert curve["time"].tolist() == [0.0, 5.0, 10.0]
+    assert curve["at_risk"].tolist() == [4, 2, 1]
+    assert curve["events"].tolist() == [1, 1, 0]
+    assert curve["censored"].tolist() == [1, 0, 1]
+    assert np.allclose(curve["survival"], [0.75, 0.375, 0.375])
+
+
+def test_curve_starts_at_one_without_events_at_time_zero():
+    curve = kaplan_meier([3, 5], [1, 0])
+    assert curve["time"].tolist() == [0.0, 3.0, 5.0]
+    assert np.allclose(curve["survival"], [1.0, 0.5, 0.5])
+
+
+def test_events_without_a_time_are_left_out_not_censored():
+    frame = pd.DataFrame({
+        KEY: ["1", "1", "2", "3", "4"],
+        "Follow_up_time": [6, 12, 24, 30, 36],
+        "death": ["No", "Yes", "Yes", "No", "Yes"],
+        "time_to_death": [None, 10, "N/A", None, None],
+    })
+    data = survival_data(frame, "Death")
+    assert data.index.tolist() == ["1", "3"]
+    assert data["event"].tolist() == [True, False]
+    assert data["time"].tolist() == [10, 30]
+    assert undated_events(frame, "Death").tolist() == ["2", "4"]